@@ -0,0 +1,307 @@
+"""Sharded, memory-mapped posture dataset: build once, rebuild incrementally, normalize at load time.
+
+Images are decoded and resized in worker processes and stored as uint8
+shards (shard-00000.npy, ...) written through memory-mapped .npy files, so
+the builder never holds more than a few images in memory. manifest.json
+records every source image's content hash, label and (shard, row), so a
+rerun only decodes new or changed images; shards left mostly empty by
+removed images are compacted by copying rows, without decoding again.
+
+    python posture_dataset.py build posture_dataset --good Original-good augmented-good --bad Original-bad augmented-bad
+    python posture_dataset.py export posture_dataset --x X.npy --y y.npy   # legacy float32 arrays
+
+Training reads it back with PostureDataset(...).batches(32), which shuffles
+indices (not arrays) and scales each batch to [0, 1] float32 as it is loaded.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# MobileNetV2 input size
+IMG_SIZE = (224, 224)
+LABELS = {'good': 0, 'bad': 1}
+MANIFEST_NAME = 'manifest.json'
+SHARD_PATTERN = 'shard-{:05d}.npy'
+
+
+def read_image(task):
+    """Worker: hash a source image and, unless its content is unchanged, decode and resize it.
+
+    Returns (hash, image or None, status) with status 'decoded', 'unchanged' or 'unreadable'.
+    """
+    path, img_size, known_hash = task
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    if digest == known_hash:
+        return digest, None, 'unchanged'
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return digest, None, 'unreadable'
+    return digest, cv2.resize(image, tuple(img_size)), 'decoded'
+
+
+def _init_worker():
+    # One OpenCV thread per process; the parallelism comes from the processes
+    cv2.setNumThreads(1)
+
+
+class ShardWriter:
+    """Appends uint8 images to memory-mapped .npy shards of at most `shard_size` rows."""
+
+    def __init__(self, output_dir, img_size, shard_size, first_shard, capacity):
+        self.output_dir = output_dir
+        self.shape = (img_size[1], img_size[0], 3)
+        self.shard_size = shard_size
+        self.next_shard = first_shard
+        self.remaining = capacity  # upper bound on the rows still to come, so the last shard is not oversized
+        self.shards = {}           # name -> rows written
+        self._array = None
+        self._name = None
+        self._rows = 0
+
+    def append(self, image):
+        """Store one image and return its (shard name, row)."""
+        if self._array is None or self._rows == len(self._array):
+            self._finish_shard()
+            self._name = SHARD_PATTERN.format(self.next_shard)
+            self.next_shard += 1
+            rows = max(1, min(self.shard_size, self.remaining))
+            self._array = np.lib.format.open_memmap(os.path.join(self.output_dir, self._name + '.tmp'),
+                                                    mode='w+', dtype=np.uint8, shape=(rows,) + self.shape)
+            self._rows = 0
+        self._array[self._rows] = image
+        self._rows += 1
+        self.remaining -= 1
+        return self._name, self._rows - 1
+
+    def skip(self):
+        """An expected image turned out to be unchanged or unreadable."""
+        self.remaining -= 1
+
+    def close(self):
+        self._finish_shard()
+        return self.shards
+
+    def _finish_shard(self):
+        if self._array is None:
+            return
+        self._array.flush()
+        del self._array
+        self._array = None
+        path = os.path.join(self.output_dir, self._name)
+        os.replace(path + '.tmp', path)
+        self.shards[self._name] = {'rows': self._rows}
+
+
+def build_dataset(sources, output_dir, img_size=IMG_SIZE, shard_size=1024, workers=None, compact_below=0.5):
+    """Build or update the dataset in `output_dir` from [(folder, label)] and return its manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if manifest is not None and tuple(manifest['img_size']) != tuple(img_size):
+        print(f"Image size changed from {manifest['img_size']} to {list(img_size)}; rebuilding")
+        manifest = None
+    manifest = manifest or {'img_size': list(img_size), 'shards': {}, 'images': {}}
+    previous = manifest['images']
+
+    # Files whose size and modification time are unchanged keep their entry without being read
+    images, tasks = {}, []
+    for key, path, label in scan_sources(sources):
+        stat = os.stat(path)
+        entry = previous.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            images[key] = dict(entry, label=label)
+        else:
+            tasks.append((key, path, label, stat, entry))
+
+    first_shard = next_shard_number(manifest['shards'])
+    writer = ShardWriter(output_dir, img_size, shard_size, first_shard, len(tasks))
+    counts = {'decoded': 0, 'unchanged': 0, 'unreadable': 0}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for key, label, stat, entry, (digest, image, status) in _read_all(executor, tasks, img_size):
+            counts[status] += 1
+            record = {'hash': digest, 'label': label, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            if status == 'decoded':
+                record['shard'], record['row'] = writer.append(image)
+            else:
+                writer.skip()
+                if status == 'unchanged' and 'shard' in entry:
+                    record['shard'], record['row'] = entry['shard'], entry['row']
+                else:
+                    record['unreadable'] = True
+            images[key] = record
+
+    shards = dict(manifest['shards'])
+    shards.update(writer.close())
+    shards = compact_shards(output_dir, img_size, shard_size, shards, images, compact_below,
+                            protected=set(writer.shards))
+
+    manifest = {'img_size': list(img_size), 'shards': shards, 'images': images}
+    save_manifest(output_dir, manifest)
+    remove_unreferenced(output_dir, shards)
+    print(f"Dataset updated: {counts['decoded']} decoded, {counts['unchanged']} unchanged, "
+          f"{len(images) - len(tasks)} skipped, {counts['unreadable']} unreadable; "
+          f"{sum(1 for e in images.values() if 'shard' in e)} images in {len(shards)} shards")
+    return manifest
+
+
+def _read_all(executor, tasks, img_size, window=512):
+    # Submitted a window at a time, so decoded images never pile up ahead of the writer
+    for start in range(0, len(tasks), window):
+        chunk = tasks[start:start + window]
+        work = [(path, img_size, (entry or {}).get('hash')) for _, path, _, _, entry in chunk]
+        for (key, _, label, stat, entry), result in zip(chunk, executor.map(read_image, work, chunksize=16)):
+            yield key, label, stat, entry, result
+
+
+def compact_shards(output_dir, img_size, shard_size, shards, images, compact_below, protected=()):
+    """Copy the live rows out of shards that are mostly unreferenced (or drop empty ones)."""
+    live = {name: [] for name in shards}
+    for key, entry in images.items():
+        if entry.get('shard') in live:
+            live[entry['shard']].append(key)
+
+    sparse = [name for name, keys in live.items()
+              if name not in protected and len(keys) < compact_below * shards[name]['rows']]
+    if not sparse:
+        return shards
+
+    shards = {name: info for name, info in shards.items() if name not in sparse}
+    writer = ShardWriter(output_dir, img_size, shard_size, next_shard_number(shards, sparse),
+                         sum(len(live[name]) for name in sparse))
+    for name in sparse:
+        source = np.load(os.path.join(output_dir, name), mmap_mode='r')
+        for key in live[name]:
+            images[key]['shard'], images[key]['row'] = writer.append(source[images[key]['row']])
+        del source
+    shards.update(writer.close())
+    return shards
+
+
+def scan_sources(sources):
+    """(key, path, label) for every file under the source folders, in a stable order."""
+    for folder, label in sources:
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                yield os.path.abspath(path), path, label
+
+
+def next_shard_number(*shard_groups):
+    numbers = [int(name[6:11]) for group in shard_groups for name in group]
+    return max(numbers) + 1 if numbers else 0
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+
+def remove_unreferenced(output_dir, shards):
+    """Delete shards no longer in the manifest and leftovers of an interrupted run."""
+    for path in glob.glob(os.path.join(output_dir, 'shard-*.npy*')):
+        if os.path.basename(path) not in shards:
+            os.remove(path)
+
+
+class PostureDataset:
+    """Read-only view of a built dataset; images stay on disk until a batch is loaded."""
+
+    def __init__(self, output_dir):
+        manifest = load_manifest(output_dir)
+        if manifest is None:
+            raise FileNotFoundError(f'No {MANIFEST_NAME} in {output_dir}')
+        self.img_size = tuple(manifest['img_size'])
+        names = sorted(manifest['shards'])
+        self.shards = [np.load(os.path.join(output_dir, name), mmap_mode='r') for name in names]
+
+        entries = [entry for _, entry in sorted(manifest['images'].items()) if 'shard' in entry]
+        shard_index = {name: i for i, name in enumerate(names)}
+        self.locations = np.array([(shard_index[e['shard']], e['row']) for e in entries], dtype=np.int64).reshape(-1, 2)
+        self.labels = np.array([e['label'] for e in entries], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def load(self, indices):
+        """Images at `indices` as a float32 array scaled to [0, 1]."""
+        indices = np.asarray(indices)
+        batch = np.empty((len(indices), self.img_size[1], self.img_size[0], 3), dtype=np.float32)
+        locations = self.locations[indices]
+        for shard in np.unique(locations[:, 0]):
+            positions = np.flatnonzero(locations[:, 0] == shard)
+            rows = locations[positions, 1]
+            order = np.argsort(rows)  # read each shard front to back
+            batch[positions[order]] = self.shards[shard][rows[order]]
+        batch /= 255.0
+        return batch
+
+    def batches(self, batch_size=32, shuffle=True, seed=None):
+        """Yield (images, labels) batches for one epoch; shuffling permutes indices, not image data."""
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            yield self.load(indices), self.labels[indices]
+
+
+def export_npy(dataset, x_path='X.npy', y_path='y.npy', seed=None, chunk_size=256):
+    """Write the legacy shuffled float32 X.npy / y.npy, one chunk in memory at a time."""
+    order = np.random.default_rng(seed).permutation(len(dataset))
+    x = np.lib.format.open_memmap(x_path, mode='w+', dtype=np.float32,
+                                  shape=(len(dataset), dataset.img_size[1], dataset.img_size[0], 3))
+    for start in range(0, len(order), chunk_size):
+        x[start:start + chunk_size] = dataset.load(order[start:start + chunk_size])
+    x.flush()
+    del x
+    np.save(y_path, dataset.labels[order])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Build or update a dataset from image folders')
+    build.add_argument('output', help='Dataset directory')
+    build.add_argument('--good', nargs='+', default=[], help='Folders of good-posture images')
+    build.add_argument('--bad', nargs='+', default=[], help='Folders of bad-posture images')
+    build.add_argument('--shard-size', type=int, default=1024, help='Images per shard')
+    build.add_argument('--workers', type=int, help='Decoding processes (default: CPU count)')
+
+    export = commands.add_parser('export', help='Write legacy X.npy / y.npy arrays from a built dataset')
+    export.add_argument('output', help='Dataset directory')
+    export.add_argument('--x', default='X.npy')
+    export.add_argument('--y', default='y.npy')
+    export.add_argument('--seed', type=int)
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        sources = [(folder, LABELS['good']) for folder in args.good] + [(folder, LABELS['bad']) for folder in args.bad]
+        if not sources:
+            parser.error('Give at least one --good or --bad folder')
+        build_dataset(sources, args.output, shard_size=args.shard_size, workers=args.workers)
+    else:
+        dataset = PostureDataset(args.output)
+        export_npy(dataset, args.x, args.y, args.seed)
+        print(f"Wrote {args.x} and {args.y} with {len(dataset)} images")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
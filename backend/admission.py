@@ -0,0 +1,94 @@
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class AnalysisOverloadedError(Exception):
+    """Raised when a frame is not admitted for analysis; carries a Retry-After hint in seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Analysis overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds how many frames are analyzed at once and sheds work that would only add latency.
+
+    At most `max_inflight` frames run at a time and at most `max_waiting` more
+    may wait. A waiting frame is dropped when a newer frame for the same
+    session (e.g. ('posture', userId)) arrives, or when it has waited longer
+    than `max_wait_ms` since it arrived. Rejected callers get a Retry-After
+    that grows with the backlog, so clients fall back to a lower frame rate.
+    """
+
+    def __init__(self, max_inflight=8, max_waiting=64, max_wait_ms=1000, max_retry_after=10):
+        self.max_inflight = max(1, int(max_inflight))
+        self.max_waiting = max(0, int(max_waiting))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.max_retry_after = max_retry_after
+        self._inflight = 0
+        self._waiting = 0
+        self._latest = {}  # session key -> sequence number of its newest frame
+        self._sequence = itertools.count()
+        self._service_time = 0.1  # moving average of seconds per admitted frame
+        self._condition = threading.Condition()
+
+    def ticket(self, key):
+        """Register a frame's arrival; it becomes the newest frame for `key`."""
+        sequence = next(self._sequence)
+        with self._condition:
+            self._latest[key] = sequence
+            # Wake any older frame of this session that is waiting, so it can give up its place
+            self._condition.notify_all()
+        return key, sequence, time.monotonic()
+
+    @contextmanager
+    def admit(self, key=None, ticket=None):
+        """Run the enclosed analysis once a slot is free, or raise AnalysisOverloadedError."""
+        key, sequence, arrived_at = ticket or self.ticket(key)
+        self._acquire(key, sequence, arrived_at)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(key, sequence, time.monotonic() - started)
+
+    def _acquire(self, key, sequence, arrived_at):
+        deadline = arrived_at + self.max_wait
+        with self._condition:
+            if self._inflight >= self.max_inflight and self._waiting >= self.max_waiting:
+                self._reject(key, sequence, 'queue_full')
+
+            self._waiting += 1
+            try:
+                while True:
+                    if self._latest.get(key) != sequence:
+                        self._reject(key, sequence, 'superseded')
+                    if self._inflight < self.max_inflight:
+                        self._inflight += 1
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(key, sequence, 'stale')
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _release(self, key, sequence, duration):
+        with self._condition:
+            self._inflight -= 1
+            self._service_time += 0.2 * (duration - self._service_time)
+            if self._latest.get(key) == sequence:
+                del self._latest[key]
+            self._condition.notify_all()
+
+    def _reject(self, key, sequence, reason):
+        # Called with the condition held
+        if self._latest.get(key) == sequence:
+            del self._latest[key]
+        backlog = (self._inflight + self._waiting) / self.max_inflight
+        retry_after = min(self.max_retry_after, max(1, math.ceil(backlog * self._service_time)))
+        raise AnalysisOverloadedError(reason, retry_after)
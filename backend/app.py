@@ -1,58 +1,206 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import bcrypt
+from flask_sock import Sock
+import hmac
 import os
 import pymongo
 from dotenv import load_dotenv
 import numpy as np
 import cv2
-import tensorflow as tf
-import mediapipe as mp
-import base64
-import zipfile
 import time
-from datetime import datetime
-from collections import defaultdict
-from bson.objectid import ObjectId
-tab_switches = defaultdict(list)  # userId -> list of tab switch events
+from concurrent.futures import ThreadPoolExecutor
+from posture_batcher import PostureBatcher
+from posture_engine import CLASS_LABELS, IMG_SIZE, POSTURE_THRESHOLD, create_posture_engine, preprocess_posture_frame
+from emotion_engine import EmotionEngine
+from eye_analyzer import EyeAnalyzer, EyeSessionStore
+from face_tracker import FaceTracker
+from model_registry import ModelNotReadyError, ModelRegistry
+from session_pool import SessionPool
+from frame_io import read_frame_upload
+from stats import (POSTURE_COUNT_FIELDS, emotion_increment, eye_increment, is_valid_emotion, posture_increment,
+                   posture_summary)
+from stats_buffer import create_stats_buffer
+from tab_store import TabActivityStore
+from report_store import ReportStore
+from password_hasher import AuthBusyError, PasswordHasher
+from admission import AdmissionController, AnalysisOverloadedError
+from database import USER_EXISTS_FIELDS, USER_LOGIN_FIELDS, create_mongo_client, ensure_indexes, get_database
+from streaming import register_stream_route
+from metrics import instrument, observe_face_locate, observe_frame_cache, observe_posture_batch, render_metrics, stage
+from frame_cache import FrameChangeCache, face_signature, frame_signature
+import tracing
 # Load environment variables
 load_dotenv()
 
+# Sampled per-request span traces and on-demand profiles (TRACE_DIR, TRACE_SAMPLE_RATE, TRACE_SLOW_MS)
+tracing.configure_from_env()
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app)
+
+# Body posture detection model; Keras by default, POSTURE_ENGINE=tflite|onnx serves a converted copy
+MODEL_PATH = os.getenv('MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'posture_model.keras'))
+# Largest batch of posture frames per forward pass (the TFLite engine allocates its tensors up to this size)
+POSTURE_MAX_BATCH_SIZE = int(os.getenv('POSTURE_MAX_BATCH_SIZE', 16))
+
+# dlib's 68-point landmark model for the eye analyzer (the copy shipped with the eye-detection scripts by default)
+SHAPE_PREDICTOR_PATH = os.getenv('SHAPE_PREDICTOR_PATH', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'HiringGuru-main', 'HiringGuru-main', 'eye', 'shape_predictor_68_face_landmarks.dat'))
+
+def load_pose_module():
+    import mediapipe as mp
+    return mp.solutions.pose
+
+def load_emotion_engine():
+    # Face detector and emotion model stay resident for the lifetime of the process
+    return EmotionEngine(detect_width=int(os.getenv('EMOTION_DETECT_WIDTH', 320))).load()
 
-# Load the body posture detection model
-MODEL_PATH = "D:\\Hiring-Guru\\backend\\posture_model.keras"
-print("🔁 Checking model format...", flush=True)
-if zipfile.is_zipfile(MODEL_PATH):
-    print("✅ Model file is a valid Keras archive", flush=True)
+def load_eye_analyzer():
+    return EyeAnalyzer(SHAPE_PREDICTOR_PATH, detect_width=int(os.getenv('EYE_DETECT_WIDTH', 320))).load()
+
+def warm_up_posture(engine):
+    engine.predict_batch(np.zeros((1,) + IMG_SIZE + (3,), dtype=np.float32))
+
+def warm_up_pose(mp_pose):
+    pose = mp_pose.Pose()
+    try:
+        pose.process(np.zeros((240, 320, 3), dtype=np.uint8))
+    finally:
+        pose.close()
+
+def warm_up_emotion(engine):
+    gray = np.zeros((240, 320), dtype=np.uint8)
+    engine.detect_faces(gray)
+    engine.classify(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), gray, [(0, 0, 48, 48)])
+
+def warm_up_eyes(analyzer):
+    gray = np.zeros((240, 320), dtype=np.uint8)
+    analyzer.detect_faces(gray)
+    analyzer.measure(gray, [(100, 60, 120, 120)])
+
+# Models load and warm up off the request path, so auth, tab and report endpoints serve
+# straight away; analysis endpoints answer 503 until their models are ready (see /readyz)
+model_registry = ModelRegistry()
+model_registry.register('posture', lambda: create_posture_engine(MODEL_PATH, max_batch_size=POSTURE_MAX_BATCH_SIZE),
+                        warm_up_posture)
+model_registry.register('pose', load_pose_module, warm_up_pose)
+model_registry.register('emotion', load_emotion_engine, warm_up_emotion)
+model_registry.register('eyes', load_eye_analyzer, warm_up_eyes)
+
+# MODEL_LOADING: background (default), eager (load and warm up before serving) or
+# preload (load only; gunicorn.conf.py warms up in each worker after the fork)
+MODEL_LOADING = os.getenv('MODEL_LOADING', 'background')
+if MODEL_LOADING == 'eager':
+    model_registry.load_all()
+    model_registry.start().join()
+elif MODEL_LOADING == 'preload':
+    model_registry.load_all()
 else:
-    print("❌ Model file is NOT a valid .keras archive. Try re-saving it.", flush=True)
-
-print("🔁 Loading model...", flush=True)
-model = tf.keras.models.load_model(MODEL_PATH)
-print("✅ Model loaded successfully", flush=True)
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()
-IMG_SIZE = (224, 224)
-CLASS_LABELS = ["Good Posture", "Bad Posture"]
-# Connect to MongoDB
+    model_registry.start()
+
+# Frames from concurrent requests are grouped into a single forward pass
+posture_batcher = PostureBatcher(
+    lambda images: model_registry.get('posture').predict_batch(images),
+    max_batch_size=POSTURE_MAX_BATCH_SIZE,
+    max_wait_ms=float(os.getenv('POSTURE_MAX_WAIT_MS', 10)),
+    on_batch=observe_posture_batch
+)
+
+# One Pose tracker per candidate so landmarks from one session never seed tracking for another
+pose_pool = SessionPool(
+    lambda: model_registry.get('pose').Pose(),
+    max_size=int(os.getenv('POSE_POOL_MAX_SIZE', 64)),
+    ttl_seconds=float(os.getenv('POSE_POOL_TTL_SECONDS', 300)),
+    on_evict=lambda tracker: tracker.close()
+)
+
+# Face boxes per candidate and analyzer: the detector runs every FACE_REDETECT_EVERY frames (or when
+# tracking confidence drops) and a template tracker runs in between. The emotion (Haar) and eye (dlib HOG)
+# detectors frame a face differently and dlib's landmark model expects its own boxes, so each analyzer
+# tracks the boxes of its own detector
+face_trackers = SessionPool(
+    lambda: FaceTracker(
+        redetect_every=int(os.getenv('FACE_REDETECT_EVERY', 10)),
+        min_confidence=float(os.getenv('FACE_TRACK_MIN_CONFIDENCE', 0.6))
+    ),
+    max_size=int(os.getenv('FACE_TRACKER_MAX_SIZE', 2000)),
+    ttl_seconds=float(os.getenv('FACE_TRACKER_TTL_SECONDS', 300))
+)
+
+# Near-identical consecutive frames from a candidate reuse the previous analysis (still counted in stats).
+# The posture CNN compares whole frames; emotion compares the face crops, at a lower threshold because a
+# smile or frown changes only part of the face (roughly a tenth of a 48x48 crop, by tens of levels)
+frame_cache = FrameChangeCache(
+    threshold=float(os.getenv('FRAME_CACHE_THRESHOLD', 4.0)),
+    thresholds={'emotion': float(os.getenv('FACE_CACHE_THRESHOLD', 2.0))},
+    max_staleness_seconds=float(os.getenv('FRAME_CACHE_MAX_STALENESS_SECONDS', 10)),
+    max_size=int(os.getenv('FRAME_CACHE_MAX_SIZE', 10000))
+)
+# Connect to MongoDB (pool size and timeouts come from the MONGO_* settings)
 try:
-    mongo_client = pymongo.MongoClient(os.getenv('MONGO_URI'))
-    db = mongo_client.interview_db
+    mongo_client = create_mongo_client()
+    db = get_database(mongo_client)
     print("MongoDB connected ✅")
 except Exception as e:
     print(f"MongoDB connection error: {e}")
 
+# Unique email and per-user userId lookups must stay indexed as the collections grow
+try:
+    ensure_indexes(db)
+    print("MongoDB indexes ready ✅")
+except Exception as e:
+    print(f"MongoDB index error: {e}")
+
 # Collections
 users_collection = db.users
 interview_setups_collection = db.interview_setups
 posture_collection = db.posture_stats
 
+# bcrypt runs on its own bounded pool, separate from the request and analysis threads
+password_hasher = PasswordHasher(
+    max_workers=int(os.getenv('AUTH_HASH_WORKERS', 2)),
+    max_queue=int(os.getenv('AUTH_HASH_QUEUE', 32)),
+    timeout_seconds=float(os.getenv('AUTH_HASH_TIMEOUT_SECONDS', 5)),
+    rounds=int(os.getenv('BCRYPT_ROUNDS', 12))
+)
+
+# Frame analysis is bounded; stale or superseded frames are shed with a 429 instead of queueing forever
+analysis_admission = AdmissionController(
+    max_inflight=int(os.getenv('ANALYSIS_MAX_INFLIGHT', 8)),
+    max_waiting=int(os.getenv('ANALYSIS_MAX_WAITING', 64)),
+    max_wait_ms=float(os.getenv('ANALYSIS_MAX_WAIT_MS', 1000))
+)
+
+# Per-frame emotion/posture counters are buffered in memory and written in bulk
+stats_buffer = create_stats_buffer(db)
+
+# Interview reports are materialized per user and updated as the stats change;
+# with several workers (SERVER_WORKERS, set by gunicorn.conf.py) cached copies are checked against MongoDB
+report_store = ReportStore(db, stats_buffer, verify_cached=int(os.getenv('SERVER_WORKERS', 1)) > 1)
+
+# Recent eye aspect ratios per candidate, for blink rate and closed-eye duration; kept in MongoDB
+# so that with several workers every frame of a candidate lands in the same history
+EYE_SESSION_SETTINGS = {
+    'capacity': int(os.getenv('EYE_HISTORY_SIZE', 256)),
+    'ear_threshold': float(os.getenv('EYE_EAR_THRESHOLD', 0.21)),
+    'sleep_seconds': float(os.getenv('EYE_SLEEP_SECONDS', 1.5))
+}
+eye_sessions = EyeSessionStore(db.eye_sessions, **EYE_SESSION_SETTINGS)
+
+# Tab switches are persisted with running aggregates and a capped event history
+tab_store = TabActivityStore(
+    db.tab_activity,
+    max_events=int(os.getenv('TAB_MAX_EVENTS', 200)),
+    listener=report_store.apply_tab_change
+)
+
 # Helper function for posture detection
 def detect_hand_raised(landmarks):
     """Detect if either hand is raised above shoulders."""
+    mp_pose = model_registry.get('pose')
     left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER]
     right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
     left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST]
@@ -63,17 +211,249 @@ def detect_hand_raised(landmarks):
     
     return left_hand_raised or right_hand_raised
 
-# Tab tracking starts here:
-# Add this to your app.py file
-# Required imports - add these if not already present
-import time
-from datetime import datetime
-from collections import defaultdict
+def locate_faces(gray, user_id, pipeline, detect):
+    """Face boxes for `user_id`'s frame, from the pipeline's tracker or, when it needs one, a full `detect` pass."""
+    with face_trackers.session((pipeline, user_id)) as tracker, stage(pipeline, 'locate'):
+        boxes, tracked = tracker.locate(gray, detect)
+    observe_face_locate(pipeline, tracked)
+    return boxes
+
+def process_emotion_frame(frame, user_id, gray=None, timestamp=None):
+    """Detect faces in a decoded frame, classify their emotions and record the result for `user_id`.
+
+    Recorded videos pass the frame's position as `timestamp`, so cached results age in video time.
+    """
+    # Convert to grayscale for face detection
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    emotion_engine = model_registry.get('emotion')
+
+    faces = []
+    try:
+        # Faces are located on every frame (tracked between detections on a downscaled copy);
+        # an expression only shows in the face itself, so unchanged face crops reuse the last classification
+        boxes = sorted(locate_faces(gray, user_id, 'emotion', emotion_engine.detect_faces),
+                       key=lambda b: b[2] * b[3], reverse=True)
+        signature = face_signature(gray, boxes)
+        cached = frame_cache.lookup('emotion', user_id, signature, timestamp) if signature is not None else None
+        observe_frame_cache('emotion', cached is not None)
+        if cached is not None:
+            faces = [dict(face, box=box) for face, box in zip(cached, boxes)]
+        elif boxes:
+            # Classify all faces in one batch, largest first
+            with stage('emotion', 'classify'):
+                faces = emotion_engine.describe(frame, gray, boxes)
+            if signature is not None:
+                frame_cache.store('emotion', user_id, signature, faces, timestamp)
+    except Exception as e:
+        print(f"Error analyzing face: {e}")
+
+    # Default if no face detected, otherwise use the largest face
+    emotion = faces[0]['emotion'] if faces else "neutral"
 
-# In-memory storage for tab activity
-tab_switches = defaultdict(list)  # userId -> list of tab switch events
+    # Queue the emotion count for the next bulk write to MongoDB
+    try:
+        with stage('emotion', 'persist'):
+            stats_buffer.record('facial_expression_stats', user_id, emotion_increment(emotion))
+    except Exception as e:
+        print(f"Error updating emotion stats: {e}")
+
+    return {
+        'emotion': emotion,
+        'faces': [{'box': list(face['box']), 'emotion': face['emotion']} for face in faces]
+    }
+
+def process_posture_frame(frame, user_id, gray=None, timestamp=None):
+    """Classify the candidate's posture in a decoded frame and record the result for `user_id`.
+
+    Recorded videos pass the frame's position as `timestamp`, so cached results age in video time.
+    """
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    hand_raised, predicted_prob = analyze_posture_inputs(frame, user_id, gray, frame_signature(gray),
+                                                         timestamp=timestamp)
+    return record_posture_result(user_id, hand_raised, predicted_prob)
+
+def analyze_posture_inputs(frame, user_id, gray, signature, executor=None, timestamp=None):
+    """(hand_raised, bad-posture probability) for a frame.
+
+    The CNN probability is reused from the previous frame if the whole frame barely changed; the
+    hand-raise check runs on every frame, because a raised hand moves the whole-frame signature too
+    little to be noticed. With an `executor`, MediaPipe runs there while the CNN runs on the calling thread.
+    """
+    cached_prob = frame_cache.lookup('posture', user_id, signature, timestamp)
+    observe_frame_cache('posture', cached_prob is not None)
+
+    if cached_prob is not None or executor is None:
+        hand_raised = detect_pose_hand_raised(frame, user_id)
+        predicted_prob = predict_posture_probability(frame, gray) if cached_prob is None else cached_prob
+    else:
+        pose_future = tracing.run_in_context(executor, detect_pose_hand_raised, frame, user_id)
+        predicted_prob = predict_posture_probability(frame, gray)
+        hand_raised = pose_future.result()
+
+    if cached_prob is None:
+        frame_cache.store('posture', user_id, signature, predicted_prob, timestamp)
+    return hand_raised, predicted_prob
+
+def detect_pose_hand_raised(frame, user_id):
+    """Run the candidate's MediaPipe Pose tracker on a frame and report whether a hand is raised."""
+    # Process with MediaPipe
+    mp_frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    with pose_pool.session(user_id) as pose, stage('posture', 'pose'):
+        results = pose.process(mp_frame_rgb)
+
+    hand_raised = False
+    if results.pose_landmarks:
+        hand_raised = detect_hand_raised(results.pose_landmarks.landmark)
+    return hand_raised
+
+def predict_posture_probability(frame, gray=None):
+    """Run the posture CNN on a frame and return the probability of bad posture."""
+    # Process frame for model
+    with stage('posture', 'preprocess'):
+        img = preprocess_posture_frame(frame, gray)
+
+    # Make prediction (batched with other in-flight requests)
+    with stage('posture', 'predict'):
+        return posture_batcher.predict(img)
+
+def record_posture_result(user_id, hand_raised, predicted_prob):
+    """Label the frame, update the posture stats for `user_id` and return the analysis result."""
+    # Determine Posture
+    threshold = POSTURE_THRESHOLD
+    if hand_raised:
+        label = "Bad Posture"
+    else:
+        predicted_class = int(predicted_prob > threshold)
+        label = CLASS_LABELS[predicted_class]
+
+    # Queue the counters for the next bulk write to MongoDB; the percentages
+    # are derived from the running totals (stored counts + unflushed deltas)
+    stats = None
+    try:
+        with stage('posture', 'persist'):
+            stats = stats_buffer.record(
+                'posture_stats', user_id, posture_increment(label),
+                load_totals=lambda: posture_collection.find_one({'userId': user_id}, POSTURE_COUNT_FIELDS)
+            )
+    except Exception as e:
+        print(f"Error updating posture stats: {e}")
+    summary = posture_summary(stats)
+
+    return {
+        'posture': label,
+        'probability': predicted_prob,
+        'hand_raised': hand_raised,
+        'stats': {
+            'good_percentage': summary['good_percentage'],
+            'bad_percentage': summary['bad_percentage']
+        }
+    }
+
+def process_eye_frame(frame, user_id, gray=None, timestamp=None, session=None):
+    """Measure the candidate's eye aspect ratio in a decoded frame, update their blink history and record the result.
+
+    Live frames go to the candidate's shared history at the current time. Recorded videos pass the
+    frame's position as `timestamp` and their own in-process EyeSession, since video time cannot mix
+    with the live history.
+    """
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    eye_analyzer = model_registry.get('eyes')
+
+    # Not frame-cached: closing the eyes barely changes a frame, and landmarks are cheap once the face is tracked
+    measurement = {}
+    try:
+        boxes = locate_faces(gray, user_id, 'eyes', eye_analyzer.detect_faces)
+        with stage('eyes', 'landmarks'):
+            measurement = eye_analyzer.measure(gray, boxes) or {}
+    except Exception as e:
+        print(f"Error analyzing eyes: {e}")
+
+    with stage('eyes', 'history'):
+        if session is None:
+            result, counts = eye_sessions.add(user_id, time.time() if timestamp is None else timestamp,
+                                              measurement.get('ear'))
+        else:
+            result, counts = session.add(timestamp, measurement.get('ear'))
+
+    # Queue the eye counters for the next bulk write to MongoDB
+    try:
+        with stage('eyes', 'persist'):
+            stats_buffer.record('eye_stats', user_id, eye_increment(**counts))
+    except Exception as e:
+        print(f"Error updating eye stats: {e}")
+
+    if measurement:
+        result['box'] = list(measurement['box'])
+        result['ear_left'] = round(measurement['ear_left'], 4)
+        result['ear_right'] = round(measurement['ear_right'], 4)
+        result['landmarks'] = np.round(measurement['eyes']).astype(int).tolist()
+    return result
+
+def process_combined_frame(frame, user_id):
+    """Run every analyzer on one decoded frame, sharing its grayscale buffer."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    # Emotion, pose landmarks and the posture CNN do not depend on each other
+    emotion_future = tracing.run_in_context(analysis_executor, process_emotion_frame, frame, user_id, gray)
+    hand_raised, predicted_prob = analyze_posture_inputs(frame, user_id, gray, frame_signature(gray), analysis_executor)
+
+    return {
+        'emotion': emotion_future.result(),
+        'posture': record_posture_result(user_id, hand_raised, predicted_prob)
+    }
+
+def overloaded_payload(error):
+    """Body and headers of the 429 for a frame that was shed; the client should skip ahead rather than resend it."""
+    return {
+        'message': 'Server busy, frame skipped',
+        'reason': error.reason,
+        'retryAfter': error.retry_after
+    }, {'Retry-After': str(error.retry_after)}
+
+def not_ready_payload(error):
+    """Body and headers of the 503 sent while an analyzer's model is still loading after a restart.
+
+    A model that failed to load does not come back without a restart, so clients are not told to retry.
+    """
+    if error.state == 'failed':
+        return {
+            'message': 'Analyzer is unavailable, its model failed to load',
+            'model': error.name,
+            'state': error.state
+        }, {}
+    return {
+        'message': 'Analyzer is starting up, please retry shortly',
+        'model': error.name,
+        'state': error.state
+    }, {'Retry-After': '5'}
+
+def readiness_payload(names=()):
+    """Body and status code for /readyz."""
+    status = model_registry.status()
+    unknown = [name for name in names if name not in status]
+    if unknown:
+        return {'error': f"Unknown analyzers: {', '.join(unknown)}"}, 400
+    ready = model_registry.is_ready(*names)
+    return {'ready': ready, 'analyzers': status}, 200 if ready else 503
+
+def overloaded_response(error):
+    body, headers = overloaded_payload(error)
+    return jsonify(body), 429, headers
+
+def not_ready_response(error):
+    body, headers = not_ready_payload(error)
+    return jsonify(body), 503, headers
+
+def record_tab_activity(user_id, status, timestamp):
+    """Store a single tab visibility change for `user_id` and return the stored entry."""
+    with stage('tab', 'persist'):
+        return tab_store.record(user_id, status, timestamp)
 
 @app.route('/api/track-tab-activity', methods=['POST'])
+@instrument('tab')
 def track_tab_activity():
     try:
         data = request.get_json()
@@ -88,17 +468,7 @@ def track_tab_activity():
         if status not in ['hidden', 'visible']:
             return jsonify({'error': 'status must be either "hidden" or "visible"'}), 400
 
-        # Create activity entry with formatted time
-        formatted_time = datetime.fromtimestamp(timestamp/1000).strftime('%H:%M:%S')
-        
-        activity = {
-            'status': status,
-            'timestamp': timestamp,
-            'formatted_time': formatted_time
-        }
-        
-        # Store in memory
-        tab_switches[user_id].append(activity)
+        activity = record_tab_activity(user_id, status, timestamp)
         
         return jsonify({
             'message': 'Tab activity tracked successfully',
@@ -113,153 +483,82 @@ def track_tab_activity():
 
 # Add this endpoint to your Flask app.py file
 @app.route('/api/generate-interview-report', methods=['GET'])
+@instrument('report')
 def generate_interview_report():
     try:
         user_id = request.args.get('userId')
         
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
-            
-        # Get user information
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-            
-        report = {
-            'user': {
-                'name': user.get('name', 'Unknown'),
-                'email': user.get('email', 'Unknown')
-            },
-            'facial_expressions': {},
-            'posture': {},
-            'tab_activity': {},
-            'interviews': []
-        }
         
-        # Get facial expression data
-        facial_data = db.facial_expression_stats.find_one({'userId': user_id})
-        if facial_data:
-            # Try to ensure facial expressions data is in a dictionary format
-            emotions = facial_data.get('emotions', {})
-
-            # If emotions data isn't in the expected dictionary format, attempt to handle it
-            if not isinstance(emotions, dict):
-                emotions = {}
-
-            report['facial_expressions'] = emotions
-            
-            # Calculate dominant emotion if data is available
-            if emotions:
-                dominant_emotion = max(emotions.items(), key=lambda x: x[1], default=("None", 0))
-                report['facial_expressions']['dominant'] = {
-                    'emotion': dominant_emotion[0],
-                    'count': dominant_emotion[1]
-                }
-
-                # Calculate percentages, ensuring all values are integers
-                total_emotions = sum(v for v in emotions.values() if isinstance(v, int))
-                if total_emotions > 0:
-                    report['facial_expressions']['percentages'] = {
-                        emotion: round((count / total_emotions) * 100, 2) 
-                        for emotion, count in emotions.items() if isinstance(count, int)
-                    }
-                else:
-                    report['facial_expressions']['percentages'] = {}
-        else:
-            report['facial_expressions'] = {'message': 'No facial expression data available'}
-        
-        # Get posture data
-        posture_data = posture_collection.find_one({'userId': user_id})
-        if posture_data:
-            report['posture'] = {
-                'good_count': posture_data.get('good_posture_count', 0),
-                'bad_count': posture_data.get('bad_posture_count', 0),
-                'good_percentage': posture_data.get('good_posture_percentage', 0),
-                'bad_percentage': posture_data.get('bad_posture_percentage', 0),
-                'total_frames': posture_data.get('total_frames', 0)
-            }
+        # Explicit rebuild from the source collections (e.g. after a manual data fix)
+        if request.args.get('rebuild'):
+            with stage('report', 'rebuild'):
+                report_store.rebuild(user_id)
         
-        # Get tab activity data
-        activities = tab_switches.get(user_id, [])
-        hidden_count = sum(1 for act in activities if act['status'] == 'hidden')
-        
-        # Calculate time spent away
-        time_away = 0
-        hidden_start = None
-        
-        for act in activities:
-            if act['status'] == 'hidden':
-                hidden_start = act['timestamp']
-            elif act['status'] == 'visible' and hidden_start is not None:
-                time_away += (act['timestamp'] - hidden_start) / 1000  # Convert to seconds
-                hidden_start = None
-        
-        # If the last status was 'hidden', count time until now
-        if hidden_start is not None:
-            time_away += (time.time() * 1000 - hidden_start) / 1000
-            
-        minutes = int(time_away // 60)
-        seconds = int(time_away % 60)
-        
-        report['tab_activity'] = {
-            'switch_count': hidden_count,
-            'time_away_seconds': round(time_away, 2),
-            'time_away_formatted': f"{minutes}m {seconds}s"
-        }
+        # Served from the materialized report; unchanged reports come from memory
+        with stage('report', 'load'):
+            etag, report = report_store.get(user_id)
+        if report is None:
+            return jsonify({'error': 'User not found'}), 404
         
-        # Get interview data from Firestore (if available)
-        # Currently using a placeholder message
-        report['interviews'] = []
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
         
         # Return the complete report
-        return jsonify({
+        response = jsonify({
             'message': 'Interview report generated successfully',
             'report': report
-        }), 200
+        })
+        response.set_etag(etag)
+        return response, 200
     
     except Exception as e:
         print(f"Error generating interview report: {e}")
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
 
-@app.route('/api/get-tab-activity', methods=['GET'])
-def get_tab_activity():
+@app.route('/api/rebuild-interview-report', methods=['POST'])
+@instrument('report_rebuild')
+def rebuild_interview_report():
     try:
-        user_id = request.args.get('userId')
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('userId') or request.args.get('userId')
         
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
         
-        # Get all tab activity for this user
-        activities = tab_switches.get(user_id, [])
-        
-        # Calculate metrics
-        hidden_count = sum(1 for act in activities if act['status'] == 'hidden')
-        
-        # Calculate time spent away (approximate)
-        time_away = 0
-        hidden_start = None
+        if report_store.rebuild(user_id) is None:
+            return jsonify({'error': 'User not found'}), 404
         
-        for act in activities:
-            if act['status'] == 'hidden':
-                hidden_start = act['timestamp']
-            elif act['status'] == 'visible' and hidden_start is not None:
-                time_away += (act['timestamp'] - hidden_start) / 1000  # Convert to seconds
-                hidden_start = None
+        return jsonify({'message': 'Interview report rebuilt successfully'}), 200
+    
+    except Exception as e:
+        print(f"Error rebuilding interview report: {e}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+@app.route('/api/get-tab-activity', methods=['GET'])
+@instrument('tab_activity')
+def get_tab_activity():
+    try:
+        user_id = request.args.get('userId')
         
-        # If the last status was 'hidden', count time until now
-        if hidden_start is not None:
-            time_away += (time.time() * 1000 - hidden_start) / 1000
+        if not user_id:
+            return jsonify({'error': 'userId is required'}), 400
         
-        minutes = int(time_away // 60)
-        seconds = int(time_away % 60)
+        # Recent tab activity plus the running aggregates for this user
+        with stage('tab', 'load'):
+            activities, tab_metrics = tab_store.activity(user_id)
         
         return jsonify({
             'activities': activities,
             'metrics': {
-                'tabSwitchCount': hidden_count,
-                'timeAwaySeconds': round(time_away, 2),
-                'timeAwayFormatted': f"{minutes}m {seconds}s"
+                'tabSwitchCount': tab_metrics['switch_count'],
+                'timeAwaySeconds': tab_metrics['time_away_seconds'],
+                'timeAwayFormatted': tab_metrics['time_away_formatted']
             }
         }), 200
     
@@ -268,88 +567,39 @@ def get_tab_activity():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/analyze-emotion-ml', methods=['POST'])
+@instrument('emotion')
 def analyze_emotion_ml():
     try:
-        # Get image data from request
-        data = request.get_json()
-        image_data = data.get('image')
-        user_id = data.get('userId', 'guest_user')
+        model_registry.require('emotion')
+
+        # Get the frame from a raw image body, multipart upload or base64 JSON
+        frame, user_id = read_frame_upload(request, pipeline='emotion')
         
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
         
-        # Process the base64 image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]  # Remove the data:image/jpeg;base64, part
-        
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
         if frame is None:
             return jsonify({'error': 'Failed to decode image'}), 400
         
-        # Convert to grayscale for face detection
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Load the face cascade for face detection
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        
-        # Detect faces
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5, minSize=(30, 30))
-        
-        # Default if no face detected
-        emotion = "neutral"
-        
-        # Process each detected face
-        for (x, y, w, h) in faces:
-            # Extract the face region
-            face_crop = frame[y:y+h, x:x+w]
-            
-            try:
-                # Analyze emotion using DeepFace
-                from deepface import DeepFace
-                result = DeepFace.analyze(face_crop, actions=['emotion'], enforce_detection=False)
-                emotion = result[0]['dominant_emotion']
-                break  # Just use the first face
-            except Exception as e:
-                print(f"Error analyzing face: {e}")
-        
-        # Store emotion in MongoDB
-        try:
-            # Get or initialize user emotion stats
-            emotion_stats = db.facial_expression_stats.find_one({'userId': user_id}) or {
-                'userId': user_id,
-                'emotions': {}
-            }
-
-            # Update emotion count
-            current_count = emotion_stats.get('emotions', {}).get(emotion, 0)
-            if 'emotions' not in emotion_stats:
-                emotion_stats['emotions'] = {}
-            emotion_stats['emotions'][emotion] = current_count + 1
-
-            # Save updated stats to MongoDB
-            db.facial_expression_stats.update_one(
-                {'userId': user_id},
-                {'$set': {'emotions': emotion_stats['emotions']}},
-                upsert=True
-            )
-        except Exception as e:
-            print(f"Error updating emotion stats: {e}")
+        with analysis_admission.admit(('emotion', user_id)):
+            result = process_emotion_frame(frame, user_id)
         
         # Return the detected emotion
         return jsonify({
-            'emotion': emotion,
+            **result,
             'message': 'Emotion analyzed successfully'
         })
         
+    except AnalysisOverloadedError as e:
+        return overloaded_response(e)
+    except ModelNotReadyError as e:
+        return not_ready_response(e)
     except Exception as e:
         print(f"Error in emotion analysis: {e}")
         return jsonify({'message': 'Server error', 'error': str(e)}), 500
 # Routes
 @app.route('/api/auth/signup', methods=['POST'])
+@instrument('signup')
 def signup():
     try:
         data = request.get_json()
@@ -358,13 +608,12 @@ def signup():
         password = data.get('password')
         
         # Check if user exists
-        user_exists = users_collection.find_one({'email': email})
+        user_exists = users_collection.find_one({'email': email}, USER_EXISTS_FIELDS)
         if user_exists:
             return jsonify({'message': 'User already exists'}), 400
         
-        # Hash the password
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        # Hash the password (on the dedicated bcrypt pool)
+        hashed_password = password_hasher.hash(password)
         
         # Create new user
         new_user = {
@@ -373,13 +622,21 @@ def signup():
             'password': hashed_password
         }
         
-        users_collection.insert_one(new_user)
+        try:
+            users_collection.insert_one(new_user)
+        except pymongo.errors.DuplicateKeyError:
+            # Another signup with the same email won the race (unique index on email)
+            return jsonify({'message': 'User already exists'}), 400
         return jsonify({'message': 'User registered successfully'}), 201
         
+    except AuthBusyError as e:
+        # Auth traffic is throttled on its own so analysis requests keep their latency
+        return jsonify({'message': 'Server busy, please try again', 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Server error', 'error': str(e)}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
+@instrument('login')
 def login():
     try:
         data = request.get_json()
@@ -387,12 +644,12 @@ def login():
         password = data.get('password')
         
         # Find user
-        user = users_collection.find_one({'email': email})
+        user = users_collection.find_one({'email': email}, USER_LOGIN_FIELDS)
         if not user:
             return jsonify({'message': 'Invalid credentials'}), 400
         
-        # Compare passwords
-        is_match = bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8'))
+        # Compare passwords (on the dedicated bcrypt pool)
+        is_match = password_hasher.verify(password, user['password'])
         if not is_match:
             return jsonify({'message': 'Invalid credentials'}), 400
         
@@ -402,10 +659,14 @@ def login():
 }), 200
 
         
+    except AuthBusyError as e:
+        # Auth traffic is throttled on its own so analysis requests keep their latency
+        return jsonify({'message': 'Server busy, please try again', 'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Server error', 'error': str(e)}), 500
 
 @app.route('/api/auth/setup', methods=['POST'])
+@instrument('setup')
 def setup_interview():
     try:
         data = request.get_json()
@@ -432,6 +693,7 @@ def setup_interview():
 
 
 @app.route('/api/analyze-emotion', methods=['POST'])
+@instrument('emotion_stats')
 def analyze_emotion():
     try:
         data = request.get_json()
@@ -441,22 +703,11 @@ def analyze_emotion():
         if not user_id or not emotion:
             return jsonify({'error': 'userId and emotion are required'}), 400
 
-        # Get or initialize user emotion stats
-        emotion_stats = db.facial_expression_stats.find_one({'userId': user_id}) or {
-            'userId': user_id,
-            'emotions': {}
-        }
-
-        # Update emotion count
-        current_count = emotion_stats.get('emotions', {}).get(emotion, 0)
-        emotion_stats['emotions'][emotion] = current_count + 1
+        if not is_valid_emotion(emotion):
+            return jsonify({'error': 'Invalid emotion'}), 400
 
-        # Save updated stats to MongoDB
-        db.facial_expression_stats.update_one(
-            {'userId': user_id},
-            {'$set': {'emotions': emotion_stats['emotions']}},
-            upsert=True
-        )
+        # Queue the emotion count for the next bulk write to MongoDB
+        stats_buffer.record('facial_expression_stats', user_id, emotion_increment(emotion))
 
         return jsonify({'message': 'Emotion stats updated successfully'}), 200
 
@@ -466,105 +717,188 @@ def analyze_emotion():
 
 
 @app.route('/api/analyze-posture', methods=['POST'])
+@instrument('posture')
 def analyze_posture():
     try:
-        # Get image data from request
-        data = request.get_json()
-        image_data = data.get('image')
-        user_id = data.get('userId', 'guest_user')
+        model_registry.require('pose', 'posture')
+
+        # Get the frame from a raw image body, multipart upload or base64 JSON
+        frame, user_id = read_frame_upload(request, pipeline='posture')
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
         
-        # Process the base64 image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]  # Remove the data:image/jpeg;base64, part
-        
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
         if frame is None:
             return jsonify({'error': 'Failed to decode image'}), 400
         
-        # Process with MediaPipe
-        mp_frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(mp_frame_rgb)
-        
-        hand_raised = False
-        if results.pose_landmarks:
-            hand_raised = detect_hand_raised(results.pose_landmarks.landmark)
-            
-        # Process frame for model
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray_frame = cv2.GaussianBlur(gray_frame, (5, 5), 0)  # Reduce noise
-        gray_frame = cv2.cvtColor(gray_frame, cv2.COLOR_GRAY2RGB)  # Convert back to 3 channels
-        img = cv2.resize(gray_frame, IMG_SIZE)
-        img = img.astype("float32") / 255.0
-        img = np.expand_dims(img, axis=0)
-        
-        # Make prediction
-        prediction = model.predict(img)
-        predicted_prob = float(prediction[0][0])
-        
-        # Determine Posture
-        threshold = 0.65  # Best threshold found is 0.11
-        if hand_raised:
-            label = "Bad Posture"
-        else:
-            predicted_class = int(predicted_prob > threshold)
-            label = CLASS_LABELS[predicted_class]
-        
-        # Store stats in MongoDB (optional)
-        try:
-            # Get existing stats
-            stats = posture_collection.find_one({'userId': user_id}) or {
-                'userId': user_id,
-                'good_posture_count': 0,
-                'bad_posture_count': 0,
-                'total_frames': 0
-            }
-            
-            # Update stats
-            if label == "Good Posture":
-                stats['good_posture_count'] = stats.get('good_posture_count', 0) + 1
-            else:
-                stats['bad_posture_count'] = stats.get('bad_posture_count', 0) + 1
-                
-            stats['total_frames'] = stats.get('total_frames', 0) + 1
-            
-            # Calculate percentages
-            good_percentage = (stats['good_posture_count'] / stats['total_frames']) * 100
-            bad_percentage = (stats['bad_posture_count'] / stats['total_frames']) * 100
-            
-            # Update document with new stats
-            stats['good_posture_percentage'] = round(good_percentage, 2)
-            stats['bad_posture_percentage'] = round(bad_percentage, 2)
-            
-            # Save to MongoDB
-            posture_collection.update_one(
-                {'userId': user_id},
-                {'$set': stats},
-                upsert=True
-            )
-        except Exception as e:
-            print(f"Error updating posture stats: {e}")
+        with analysis_admission.admit(('posture', user_id)):
+            result = process_posture_frame(frame, user_id)
         
         # Return posture analysis
-        return jsonify({
-            'posture': label,
-            'probability': predicted_prob,
-            'hand_raised': hand_raised,
-            'stats': {
-                'good_percentage': round(good_percentage, 2) if 'good_percentage' in locals() else 0,
-                'bad_percentage': round(bad_percentage, 2) if 'bad_percentage' in locals() else 0
-            }
-        })
+        return jsonify(result)
         
+    except AnalysisOverloadedError as e:
+        return overloaded_response(e)
+    except ModelNotReadyError as e:
+        return not_ready_response(e)
     except Exception as e:
         print(f"Error in posture analysis: {e}")
         return jsonify({'message': 'Server error', 'error': str(e)}), 500
 
-# Run the app
+@app.route('/api/analyze-eyes', methods=['POST'])
+@instrument('eyes')
+def analyze_eyes():
+    try:
+        model_registry.require('eyes')
+
+        # Get the frame from a raw image body, multipart upload or base64 JSON
+        frame, user_id = read_frame_upload(request, pipeline='eyes')
+        if not user_id:
+            return jsonify({'error': 'userId is required'}), 400
+
+        if frame is None:
+            return jsonify({'error': 'Failed to decode image'}), 400
+
+        with analysis_admission.admit(('eyes', user_id)):
+            result = process_eye_frame(frame, user_id)
+
+        return jsonify({
+            **result,
+            'message': 'Eyes analyzed successfully'
+        })
+
+    except AnalysisOverloadedError as e:
+        return overloaded_response(e)
+    except ModelNotReadyError as e:
+        return not_ready_response(e)
+    except Exception as e:
+        print(f"Error in eye analysis: {e}")
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+# Shared pool for running independent analysis stages of one frame concurrently
+analysis_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ANALYSIS_MAX_WORKERS', 8)),
+    thread_name_prefix='analysis'
+)
+
+@app.route('/api/analyze-frame', methods=['POST'])
+@instrument('frame')
+def analyze_frame():
+    try:
+        model_registry.require('emotion', 'pose', 'posture')
+
+        # Get the frame from a raw image body, multipart upload or base64 JSON
+        frame, user_id = read_frame_upload(request, pipeline='frame')
+        if not user_id:
+            return jsonify({'error': 'userId is required'}), 400
+
+        if frame is None:
+            return jsonify({'error': 'Failed to decode image'}), 400
+
+        # Decoded once, then fanned out to the emotion and posture analyzers
+        with analysis_admission.admit(('frame', user_id)):
+            result = process_combined_frame(frame, user_id)
+
+        return jsonify({
+            **result,
+            'message': 'Frame analyzed successfully'
+        })
+
+    except AnalysisOverloadedError as e:
+        return overloaded_response(e)
+    except ModelNotReadyError as e:
+        return not_ready_response(e)
+    except Exception as e:
+        print(f"Error in frame analysis: {e}")
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the process is up and serving auth, tab and report requests (models may still be loading)
+    return jsonify({'status': 'ok', 'analyzers': model_registry.status()}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness: 200 once the models are loaded and warmed up; ?analyzers=emotion,pose checks only those
+    names = [name for name in request.args.get('analyzers', '').split(',') if name]
+    body, status_code = readiness_payload(names)
+    return jsonify(body), status_code
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape endpoint: request counts, errors, in-flight and per-stage latency
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+def admin_authorized(token):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, and then require it in X-Admin-Token."""
+    expected = os.getenv('ADMIN_TOKEN')
+    return bool(expected) and hmac.compare_digest((token or '').encode('utf-8'), expected.encode('utf-8'))
+
+@app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        if request.method == 'POST':
+            # Profile the next `count` requests of an endpoint, e.g. {"endpoint": "analyze_emotion_ml", "count": 20}
+            data = request.get_json(silent=True) or {}
+            endpoint = data.get('endpoint')
+            if endpoint not in app.view_functions:
+                return jsonify({'error': 'Unknown endpoint', 'endpoints': sorted(app.view_functions)}), 400
+            tracing.profiler.arm(endpoint, int(data.get('count', 10)))
+        elif request.method == 'DELETE':
+            tracing.profiler.disarm(request.args.get('endpoint'))
+        return jsonify({**tracing.profiler.status(), 'output_dir': tracing.profiler.output_dir}), 200
+
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/admin/tracing', methods=['GET', 'POST'])
+def admin_tracing():
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        if request.method == 'POST':
+            # Change the sample rate / slow threshold at runtime, e.g. {"sample_rate": 0.05, "slow_ms": 250}
+            data = request.get_json(silent=True) or {}
+            tracing.tracer.configure(sample_rate=data.get('sample_rate'), slow_ms=data.get('slow_ms'))
+        return jsonify(tracing.tracer.settings()), 200
+
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+# Live interview channel: frames and tab events in, results pushed back as they finish
+register_stream_route(
+    sock,
+    {'emotion': process_emotion_frame, 'posture': process_posture_frame, 'eyes': process_eye_frame},
+    record_tab_activity,
+    max_workers=int(os.getenv('STREAM_MAX_WORKERS', 8)),
+    admission=analysis_admission
+)
+
+def prepare_for_fork():
+    """Called once in the gunicorn master after the app is preloaded, just before workers are forked."""
+    # Write what startup recorded; each worker then opens its own client (connect_after_fork)
+    stats_buffer.flush()
+
+def connect_after_fork():
+    """Called in each gunicorn worker right after the fork: open its own MongoDB client and rebind every handle.
+
+    A MongoClient's sockets and monitor threads belong to the process that created it, and
+    closing the master's client would leave the inherited collection handles unusable.
+    """
+    global mongo_client, db, users_collection, interview_setups_collection, posture_collection
+    mongo_client = create_mongo_client()
+    db = get_database(mongo_client)
+    users_collection = db.users
+    interview_setups_collection = db.interview_setups
+    posture_collection = db.posture_stats
+    stats_buffer.db = db
+    report_store.db = db
+    report_store.reports = db.interview_reports
+    tab_store.collection = db.tab_activity
+    eye_sessions.collection = db.eye_sessions
+
+# Run the app (single process; see gunicorn.conf.py for the multi-worker mode)
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,412 @@
+"""Async (ASGI) serving mode for the same API as app.py.
+
+Run with:  hypercorn asgi_app:app --bind 0.0.0.0:5000
+
+Auth, tab tracking and report handlers use a non-blocking Mongo client
+(Motor, or the in-memory stand-in with MONGO_URI=mongomock://). Frame
+analysis reuses the analyzers, write-behind stats buffer and report store
+from app.py and runs on a dedicated executor so it never blocks the loop.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymongo
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+
+import app as core  # models, analyzers, stats buffer and report store shared with the Flask app
+import tracing
+from database import USER_EXISTS_FIELDS, USER_LOGIN_FIELDS, create_async_mongo_client, get_database
+from frame_io import decode_frame, read_frame_bytes_async
+from model_registry import ModelNotReadyError
+from metrics import instrument_async, render_metrics, stage
+from admission import AnalysisOverloadedError
+from password_hasher import AuthBusyError
+from report_store import is_current, tab_mirror_update
+from stats import emotion_increment, is_valid_emotion
+from tab_store import AsyncTabActivityStore
+
+app = cors(Quart(__name__))
+
+# CPU-bound inference runs here, never on the event loop
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASYNC_INFERENCE_WORKERS', 8)),
+    thread_name_prefix='inference'
+)
+
+mongo = {}
+
+
+@app.before_serving
+async def connect_mongo():
+    client = create_async_mongo_client()
+    db = get_database(client)
+    mongo['client'] = client
+    mongo['db'] = db
+    mongo['tab_store'] = AsyncTabActivityStore(
+        db['tab_activity'],
+        max_events=int(os.getenv('TAB_MAX_EVENTS', 200)),
+        listener=mirror_tab_change
+    )
+    print("Async MongoDB client ready ✅")
+
+
+@app.after_serving
+async def disconnect_mongo():
+    core.stats_buffer.flush()
+    mongo['client'].close()
+
+
+async def run_blocking(fn, *args, executor=None):
+    # Copy the context so stages on the worker thread land on the current request's trace
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+
+
+async def mirror_tab_change(user_id, tab):
+    """Async counterpart of ReportStore.apply_tab_change."""
+    try:
+        await mongo['db']['interview_reports'].update_one(*tab_mirror_update(user_id, tab), upsert=True)
+    except pymongo.errors.DuplicateKeyError:
+        pass  # the report already holds a newer tab version
+    except Exception as e:
+        print(f"Error updating materialized report: {e}")
+        core.report_store.mark_stale(user_id)
+    core.report_store.invalidate(user_id)
+
+
+async def get_report(user_id):
+    """Async counterpart of ReportStore.get."""
+    report_store = core.report_store
+    version = None
+    if report_store.verify_cached:
+        doc = await mongo['db']['interview_reports'].find_one({'userId': user_id}, {'_id': 0, 'version': 1})
+        version = (doc or {}).get('version')
+    cached = report_store.cached(user_id, version)
+    if cached is not None:
+        return cached
+
+    # Flushes cannot be held across an await, so retry if one overlapped the read
+    if not report_store.is_stale(user_id):
+        for _ in range(3):
+            token = report_store.change_token(user_id)
+            generation = core.stats_buffer.flush_generation()
+            if generation % 2 == 0:
+                doc = await mongo['db']['interview_reports'].find_one({'userId': user_id}, {'_id': 0})
+                pending = report_store.pending(user_id)
+                if core.stats_buffer.flush_generation() == generation:
+                    if is_current(doc):
+                        return report_store.finish(user_id, doc, pending, token)
+                    break
+            await asyncio.sleep(0.005)
+
+    # Missing or stale copy (or a busy flusher): rebuild on a worker thread with flushes held
+    return await run_blocking(report_store.get, user_id)
+
+
+def decode_and_process(process, buffer, user_id, pipeline, ticket):
+    with stage(pipeline, 'imdecode'):
+        frame = decode_frame(buffer)
+    if frame is None:
+        return None
+    # The ticket was taken on arrival, so time spent queued for this executor counts towards staleness
+    with core.analysis_admission.admit(ticket=ticket):
+        return process(frame, user_id)
+
+
+async def analyze_upload(process, pipeline, models, message=None):
+    try:
+        core.model_registry.require(*models)
+    except ModelNotReadyError as e:
+        body, headers = core.not_ready_payload(e)
+        return jsonify(body), 503, headers
+
+    with stage(pipeline, 'read_body'):
+        buffer, user_id = await read_frame_bytes_async(request)
+    if not user_id:
+        return jsonify({'error': 'userId is required'}), 400
+
+    ticket = core.analysis_admission.ticket((pipeline, user_id))
+    try:
+        result = await run_blocking(decode_and_process, process, buffer, user_id, pipeline, ticket,
+                                    executor=inference_executor)
+    except AnalysisOverloadedError as e:
+        body, headers = core.overloaded_payload(e)
+        return jsonify(body), 429, headers
+    except ModelNotReadyError as e:
+        body, headers = core.not_ready_payload(e)
+        return jsonify(body), 503, headers
+    if result is None:
+        return jsonify({'error': 'Failed to decode image'}), 400
+    if message:
+        result = {**result, 'message': message}
+    return jsonify(result)
+
+
+@app.route('/api/auth/signup', methods=['POST'])
+@instrument_async('signup')
+async def signup():
+    try:
+        data = await request.get_json()
+        name = data.get('name')
+        email = data.get('email')
+        password = data.get('password')
+
+        users = mongo['db']['users']
+        if await users.find_one({'email': email}, USER_EXISTS_FIELDS):
+            return jsonify({'message': 'User already exists'}), 400
+
+        hashed_password = await core.password_hasher.hash_async(password)
+        try:
+            await users.insert_one({'name': name, 'email': email, 'password': hashed_password})
+        except pymongo.errors.DuplicateKeyError:
+            return jsonify({'message': 'User already exists'}), 400
+        return jsonify({'message': 'User registered successfully'}), 201
+
+    except AuthBusyError as e:
+        return jsonify({'message': 'Server busy, please try again', 'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/api/auth/login', methods=['POST'])
+@instrument_async('login')
+async def login():
+    try:
+        data = await request.get_json()
+        email = data.get('email')
+        password = data.get('password')
+
+        user = await mongo['db']['users'].find_one({'email': email}, USER_LOGIN_FIELDS)
+        if not user:
+            return jsonify({'message': 'Invalid credentials'}), 400
+
+        if not await core.password_hasher.verify_async(password, user['password']):
+            return jsonify({'message': 'Invalid credentials'}), 400
+
+        return jsonify({'message': 'Login successful', 'userId': str(user['_id'])}), 200
+
+    except AuthBusyError as e:
+        return jsonify({'message': 'Server busy, please try again', 'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/api/auth/setup', methods=['POST'])
+@instrument_async('setup')
+async def setup_interview():
+    try:
+        data = await request.get_json()
+        job_description = data.get('jobDescription')
+        number_of_questions = data.get('numberOfQuestions')
+        difficulty_level = data.get('difficultyLevel')
+
+        if not job_description or not number_of_questions or not difficulty_level:
+            return jsonify({'message': 'All fields are required'}), 400
+
+        await mongo['db']['interview_setups'].insert_one({
+            'jobDescription': job_description,
+            'numberOfQuestions': number_of_questions,
+            'difficultyLevel': difficulty_level
+        })
+        return jsonify({'message': 'Interview setup saved successfully'}), 201
+
+    except Exception as e:
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/api/track-tab-activity', methods=['POST'])
+@instrument_async('tab')
+async def track_tab_activity():
+    try:
+        data = await request.get_json()
+        user_id = data.get('userId')
+        status = data.get('status')  # 'hidden' or 'visible'
+        timestamp = data.get('timestamp') or int(time.time() * 1000)  # Client timestamp or server time
+
+        if not user_id or not status:
+            return jsonify({'error': 'userId and status are required'}), 400
+
+        if status not in ['hidden', 'visible']:
+            return jsonify({'error': 'status must be either "hidden" or "visible"'}), 400
+
+        with stage('tab', 'persist'):
+            activity = await mongo['tab_store'].record(user_id, status, timestamp)
+        return jsonify({'message': 'Tab activity tracked successfully', 'activity': activity}), 200
+
+    except Exception as e:
+        print(f"Error tracking tab activity: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/get-tab-activity', methods=['GET'])
+@instrument_async('tab_activity')
+async def get_tab_activity():
+    try:
+        user_id = request.args.get('userId')
+        if not user_id:
+            return jsonify({'error': 'userId is required'}), 400
+
+        with stage('tab', 'load'):
+            activities, tab_metrics = await mongo['tab_store'].activity(user_id)
+        return jsonify({
+            'activities': activities,
+            'metrics': {
+                'tabSwitchCount': tab_metrics['switch_count'],
+                'timeAwaySeconds': tab_metrics['time_away_seconds'],
+                'timeAwayFormatted': tab_metrics['time_away_formatted']
+            }
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching tab activity: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/generate-interview-report', methods=['GET'])
+@instrument_async('report')
+async def generate_interview_report():
+    try:
+        user_id = request.args.get('userId')
+        if not user_id:
+            return jsonify({'error': 'userId is required'}), 400
+
+        if request.args.get('rebuild'):
+            with stage('report', 'rebuild'):
+                await run_blocking(core.report_store.rebuild, user_id)
+
+        with stage('report', 'load'):
+            etag, report = await get_report(user_id)
+        if report is None:
+            return jsonify({'error': 'User not found'}), 404
+
+        if request.if_none_match.contains(etag):
+            response = Response('', status=304)
+            response.set_etag(etag)
+            return response
+
+        response = jsonify({'message': 'Interview report generated successfully', 'report': report})
+        response.set_etag(etag)
+        return response, 200
+
+    except Exception as e:
+        print(f"Error generating interview report: {e}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+@app.route('/api/rebuild-interview-report', methods=['POST'])
+@instrument_async('report_rebuild')
+async def rebuild_interview_report():
+    try:
+        data = await request.get_json(silent=True) or {}
+        user_id = data.get('userId') or request.args.get('userId')
+        if not user_id:
+            return jsonify({'error': 'userId is required'}), 400
+
+        # Rare admin path; reads several collections with flushes held, so it runs on a thread
+        if await run_blocking(core.report_store.rebuild, user_id) is None:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify({'message': 'Interview report rebuilt successfully'}), 200
+
+    except Exception as e:
+        print(f"Error rebuilding interview report: {e}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+@app.route('/api/analyze-emotion', methods=['POST'])
+@instrument_async('emotion_stats')
+async def analyze_emotion():
+    try:
+        data = await request.get_json()
+        user_id = data.get('userId')
+        emotion = data.get('emotion')
+
+        if not user_id or not emotion:
+            return jsonify({'error': 'userId and emotion are required'}), 400
+
+        if not is_valid_emotion(emotion):
+            return jsonify({'error': 'Invalid emotion'}), 400
+
+        with stage('emotion', 'persist'):
+            await run_blocking(core.stats_buffer.record, 'facial_expression_stats', user_id,
+                               emotion_increment(emotion))
+        return jsonify({'message': 'Emotion stats updated successfully'}), 200
+
+    except Exception as e:
+        print(f"Error in analyze_emotion: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/analyze-emotion-ml', methods=['POST'])
+@instrument_async('emotion')
+async def analyze_emotion_ml():
+    try:
+        return await analyze_upload(core.process_emotion_frame, 'emotion', ['emotion'], 'Emotion analyzed successfully')
+    except Exception as e:
+        print(f"Error in emotion analysis: {e}")
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/api/analyze-posture', methods=['POST'])
+@instrument_async('posture')
+async def analyze_posture():
+    try:
+        return await analyze_upload(core.process_posture_frame, 'posture', ['pose', 'posture'])
+    except Exception as e:
+        print(f"Error in posture analysis: {e}")
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/api/analyze-frame', methods=['POST'])
+@instrument_async('frame')
+async def analyze_frame():
+    try:
+        return await analyze_upload(core.process_combined_frame, 'frame', ['emotion', 'pose', 'posture'], 'Frame analyzed successfully')
+    except Exception as e:
+        print(f"Error in frame analysis: {e}")
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/api/analyze-eyes', methods=['POST'])
+@instrument_async('eyes')
+async def analyze_eyes():
+    try:
+        return await analyze_upload(core.process_eye_frame, 'eyes', ['eyes'], 'Eyes analyzed successfully')
+    except Exception as e:
+        print(f"Error in eye analysis: {e}")
+        return jsonify({'message': 'Server error', 'error': str(e)}), 500
+
+
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    return jsonify({'status': 'ok', 'analyzers': core.model_registry.status()}), 200
+
+
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    names = [name for name in request.args.get('analyzers', '').split(',') if name]
+    body, status_code = core.readiness_payload(names)
+    return jsonify(body), status_code
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/api/admin/tracing', methods=['GET', 'POST'])
+async def admin_tracing():
+    if not core.admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        if request.method == 'POST':
+            data = await request.get_json(silent=True) or {}
+            tracing.tracer.configure(sample_rate=data.get('sample_rate'), slow_ms=data.get('slow_ms'))
+        return jsonify(tracing.tracer.settings()), 200
+
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
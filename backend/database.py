@@ -0,0 +1,115 @@
+import os
+
+import pymongo
+
+# Collections looked up by userId on every frame / poll; one document per user
+PER_USER_COLLECTIONS = ['facial_expression_stats', 'posture_stats', 'eye_stats', 'eye_sessions', 'tab_activity',
+                        'interview_reports']
+
+# Only the fields each handler actually reads
+USER_EXISTS_FIELDS = {'_id': 1}
+USER_LOGIN_FIELDS = {'_id': 1, 'password': 1}
+USER_PROFILE_FIELDS = {'_id': 0, 'name': 1, 'email': 1}
+
+
+def mongo_client_options():
+    """Connection-pool and timeout settings, configurable through the environment."""
+    return {
+        'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+        'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+        'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000)),
+        'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 10000))
+    }
+
+
+# MONGO_URI=mongomock:// selects an in-memory stand-in (for tests and load runs)
+IN_MEMORY_SCHEME = 'mongomock://'
+_in_memory_clients = {}
+
+
+def create_mongo_client(uri=None):
+    uri = uri or os.getenv('MONGO_URI')
+    if uri and uri.startswith(IN_MEMORY_SCHEME):
+        return _in_memory_client(uri)
+    return pymongo.MongoClient(uri, **mongo_client_options())
+
+
+def create_async_mongo_client(uri=None):
+    """Non-blocking client for the async serving mode (Motor, or the in-memory stand-in)."""
+    uri = uri or os.getenv('MONGO_URI')
+    if uri and uri.startswith(IN_MEMORY_SCHEME):
+        # Wraps the same in-memory client as create_mongo_client, so both see the same data
+        return AsyncInMemoryClient(_in_memory_client(uri))
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(uri, **mongo_client_options())
+
+
+def _in_memory_client(uri):
+    import mongomock
+    if uri not in _in_memory_clients:
+        _in_memory_clients[uri] = mongomock.MongoClient()
+    return _in_memory_clients[uri]
+
+
+def get_database(client):
+    return client[os.getenv('MONGO_DB_NAME', 'interview_db')]
+
+
+def ensure_indexes(db):
+    """Create the indexes the handlers rely on; safe to run on every startup."""
+    index_specs = [(db.users, 'email', True)]
+    index_specs += [(db[name], 'userId', True) for name in PER_USER_COLLECTIONS]
+
+    for collection, field, unique in index_specs:
+        try:
+            collection.create_index([(field, pymongo.ASCENDING)], unique=unique, background=True)
+        except pymongo.errors.OperationFailure as e:
+            # Most likely duplicates left over from before the index existed; keep serving
+            # with a plain index and report it so the data can be cleaned up
+            print(f"⚠️ Could not create unique index on {collection.name}.{field}: {e}")
+            collection.create_index([(field, pymongo.ASCENDING)], background=True)
+
+
+class AsyncInMemoryClient:
+    """Motor-style async facade over a mongomock client (the calls never block on I/O)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getitem__(self, name):
+        return AsyncInMemoryDatabase(self._client[name])
+
+    def close(self):
+        pass
+
+
+class AsyncInMemoryDatabase:
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, name):
+        return AsyncInMemoryCollection(self._db[name])
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+class AsyncInMemoryCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    @property
+    def name(self):
+        return self._collection.name
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
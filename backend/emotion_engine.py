@@ -0,0 +1,107 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Output order of DeepFace's facial-attribute emotion model
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+EMOTION_INPUT_SIZE = (48, 48)
+
+
+class EmotionEngine:
+    """Resident face detector + emotion model, loaded once and shared by every request."""
+
+    def __init__(self, detect_width=320, scale_factor=1.3, min_neighbors=5, min_face_size=30):
+        self.detect_width = detect_width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face_size = min_face_size
+        self.face_cascade = None
+        self.emotion_model = None
+        self._deepface = None
+        self._lock = threading.Lock()
+        # A CascadeClassifier keeps per-call evaluator state on the object, so detections are serialised
+        self._detect_lock = threading.Lock()
+
+    def load(self):
+        """Load the Haar cascade and the DeepFace emotion model (safe to call more than once)."""
+        with self._lock:
+            if self.face_cascade is None:
+                self.face_cascade = cv2.CascadeClassifier(
+                    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+            if self._deepface is None:
+                from deepface import DeepFace
+                self._deepface = DeepFace
+                self.emotion_model = _build_emotion_model(DeepFace)
+        return self
+
+    def detect_faces(self, gray):
+        """Run Haar detection on a downscaled copy of `gray` and return boxes in full-resolution coordinates."""
+        if self.face_cascade is None:
+            self.load()
+
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.detect_width / float(width)) if self.detect_width else 1.0
+        small = gray if scale == 1.0 else cv2.resize(gray, None, fx=scale, fy=scale,
+                                                      interpolation=cv2.INTER_AREA)
+
+        min_size = max(10, int(round(self.min_face_size * scale)))
+        with self._detect_lock:
+            faces = self.face_cascade.detectMultiScale(small, scaleFactor=self.scale_factor,
+                                                       minNeighbors=self.min_neighbors,
+                                                       minSize=(min_size, min_size))
+        if len(faces) == 0:
+            return []
+
+        # Map boxes back to the original frame and clip them to its bounds
+        boxes = np.round(np.asarray(faces, dtype=np.float32) / scale).astype(int)
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+        return [tuple(int(v) for v in box) for box in boxes]
+
+    def classify(self, frame, gray, boxes):
+        """Classify every face in `boxes` in one batch and return their dominant emotions."""
+        if not boxes:
+            return []
+        if self._deepface is None:
+            self.load()
+
+        if self.emotion_model is None:
+            # Fall back to DeepFace.analyze per face, but skip its own face detection
+            emotions = []
+            for (x, y, w, h) in boxes:
+                result = self._deepface.analyze(frame[y:y + h, x:x + w], actions=['emotion'],
+                                                enforce_detection=False, detector_backend='skip')
+                emotions.append(result[0]['dominant_emotion'])
+            return emotions
+
+        batch = np.stack([
+            cv2.resize(gray[y:y + h, x:x + w], EMOTION_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+            for (x, y, w, h) in boxes
+        ]).astype("float32") / 255.0
+        predictions = np.asarray(self.emotion_model.predict_on_batch(batch[..., np.newaxis]))
+        return [EMOTION_LABELS[i] for i in np.argmax(predictions, axis=1)]
+
+    def describe(self, frame, gray, boxes):
+        """Classify already-detected `boxes` as [{'box': (x, y, w, h), 'emotion': ...}], largest face first."""
+        boxes = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+        emotions = self.classify(frame, gray, boxes)
+        return [{'box': box, 'emotion': emotion} for box, emotion in zip(boxes, emotions)]
+
+
+def _build_emotion_model(DeepFace):
+    """Return the underlying Keras emotion model from whichever DeepFace version is installed."""
+    try:
+        try:
+            client = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+        except TypeError:
+            client = DeepFace.build_model("Emotion")
+    except Exception as e:
+        print(f"Could not build DeepFace emotion model, falling back to DeepFace.analyze: {e}")
+        return None
+
+    # Newer DeepFace wraps the Keras model in a client object
+    return getattr(client, 'model', client)
@@ -0,0 +1,226 @@
+import itertools
+import threading
+
+import cv2
+import numpy as np
+import pymongo
+
+# Indices of the eye contours in dlib's 68-point face model, six points per eye
+# (outer corner, two upper lid points, inner corner, two lower lid points)
+EYE_POINTS = range(36, 48)
+
+
+class EyeAnalyzer:
+    """Resident dlib face detector + 68-point landmark predictor for eye-state analysis.
+
+    Faces are found with the HOG detector on a downscaled copy of the frame;
+    landmarks are then fitted on the full-resolution frame inside the mapped
+    box, so the eye contours keep their precision.
+    """
+
+    def __init__(self, predictor_path, detect_width=320, upsample=0):
+        self.predictor_path = predictor_path
+        self.detect_width = detect_width
+        self.upsample = upsample
+        self.detector = None
+        self.predictor = None
+        self._dlib = None
+        # dlib's HOG detector keeps scratch buffers, so detections are serialised
+        self._detect_lock = threading.Lock()
+
+    def load(self):
+        """Load the HOG face detector and the shape predictor (safe to call more than once)."""
+        if self._dlib is None:
+            import dlib
+            self.detector = dlib.get_frontal_face_detector()
+            self.predictor = dlib.shape_predictor(self.predictor_path)
+            self._dlib = dlib
+        return self
+
+    def detect_faces(self, gray):
+        """Run HOG detection on a downscaled copy of `gray` and return boxes in full-resolution coordinates, largest first."""
+        if self._dlib is None:
+            self.load()
+
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.detect_width / float(width)) if self.detect_width else 1.0
+        small = gray if scale == 1.0 else cv2.resize(gray, None, fx=scale, fy=scale,
+                                                      interpolation=cv2.INTER_AREA)
+        with self._detect_lock:
+            rects = self.detector(small, self.upsample)
+        if len(rects) == 0:
+            return []
+
+        # Map boxes back to the original frame and clip them to its bounds
+        corners = np.array([(r.left(), r.top(), r.right(), r.bottom()) for r in rects], dtype=np.float32) / scale
+        corners = np.round(corners).astype(int)
+        corners[:, [0, 2]] = np.clip(corners[:, [0, 2]], 0, width - 1)
+        corners[:, [1, 3]] = np.clip(corners[:, [1, 3]], 0, height - 1)
+        boxes = [(int(x1), int(y1), int(x2 - x1), int(y2 - y1)) for x1, y1, x2, y2 in corners if x2 > x1 and y2 > y1]
+        return sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+
+    def eye_landmarks(self, gray, box):
+        """(2, 6, 2) float32 array with the left and right eye contours of the face in `box`."""
+        if self._dlib is None:
+            self.load()
+        x, y, w, h = box
+        shape = self.predictor(gray, self._dlib.rectangle(x, y, x + w, y + h))
+        return landmarks_to_array(shape, EYE_POINTS).reshape(2, 6, 2)
+
+    def measure(self, gray, boxes=None):
+        """Eye aspect ratios of the largest face, or None when no face is found.
+
+        `boxes` (x, y, w, h), largest first, skips detection when the caller already has them.
+        """
+        if boxes is None:
+            boxes = self.detect_faces(gray)
+        if not boxes:
+            return None
+        box = tuple(int(v) for v in boxes[0])
+        eyes = self.eye_landmarks(gray, box)
+        left, right = eye_aspect_ratio(eyes)
+        return {
+            'box': box,
+            'ear': float((left + right) / 2.0),
+            'ear_left': float(left),
+            'ear_right': float(right),
+            'eyes': eyes
+        }
+
+
+class EyeSession:
+    """Recent eye aspect ratios of one candidate in a fixed-size ring buffer (in-process, e.g. for recorded videos).
+
+    Each sample is (timestamp, EAR), with NaN for frames without a face.
+    Blinks are open-to-closed transitions between consecutive samples, so the
+    blink rate is only meaningful at streaming frame rates; at the HTTP
+    polling interval the closed-eye duration drives the status instead.
+    """
+
+    def __init__(self, capacity=256, ear_threshold=0.21, sleep_seconds=1.5, window_seconds=60.0, max_gap_seconds=5.0):
+        self.capacity = max(2, int(capacity))
+        self.ear_threshold = ear_threshold
+        self.sleep_seconds = sleep_seconds
+        self.window_seconds = window_seconds
+        self.max_gap_seconds = max_gap_seconds
+        self._times = np.full(self.capacity, np.nan)
+        self._ears = np.full(self.capacity, np.nan)
+        self._next = 0
+        self._size = 0
+
+    def add(self, timestamp, ear):
+        """Append a sample and return the per-frame result plus the counter increments it adds."""
+        self._times[self._next] = timestamp
+        self._ears[self._next] = np.nan if ear is None else ear
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        times, ears = self.samples(timestamp - self.window_seconds)
+        return evaluate_eye_samples(times, ears, self.ear_threshold, self.sleep_seconds, self.max_gap_seconds)
+
+    def samples(self, since=None):
+        """(timestamps, EARs) in chronological order, optionally only those at or after `since`."""
+        order = (np.arange(self._size) + self._next - self._size) % self.capacity
+        times, ears = self._times[order], self._ears[order]
+        if since is not None:
+            keep = times >= since
+            times, ears = times[keep], ears[keep]
+        return times, ears
+
+
+class EyeSessionStore:
+    """Eye sample histories of all candidates in MongoDB, so every worker process sees a candidate's whole history.
+
+    Each frame appends its (timestamp, EAR) to the candidate's document with
+    one atomic $push capped at `capacity`, which also returns the history up
+    to and including that sample; the result is then evaluated on that
+    snapshot exactly as for an EyeSession. Timestamps must come from the wall
+    clock, the one clock all workers share.
+    """
+
+    def __init__(self, collection, capacity=256, ear_threshold=0.21, sleep_seconds=1.5, window_seconds=60.0,
+                 max_gap_seconds=5.0):
+        self.collection = collection
+        self.capacity = max(2, int(capacity))
+        self.ear_threshold = ear_threshold
+        self.sleep_seconds = sleep_seconds
+        self.window_seconds = window_seconds
+        self.max_gap_seconds = max_gap_seconds
+
+    def add(self, user_id, timestamp, ear):
+        """Append a sample for `user_id` and return the per-frame result plus the counter increments it adds."""
+        doc = self.collection.find_one_and_update(
+            {'userId': user_id},
+            {'$push': {'samples': {'$each': [[timestamp, None if ear is None else float(ear)]],
+                                   '$slice': -self.capacity}}},
+            projection={'_id': 0, 'samples': 1},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        samples = np.array([(t, np.nan if e is None else e) for t, e in doc['samples']], dtype=np.float64)
+        times, ears = samples[:, 0], samples[:, 1]
+        # This sample is last; one pushed just before it by another worker with a later timestamp is left out
+        keep = (times >= timestamp - self.window_seconds) & (times <= timestamp)
+        keep[-1] = True
+        return evaluate_eye_samples(times[keep], ears[keep], self.ear_threshold, self.sleep_seconds,
+                                    self.max_gap_seconds)
+
+    def discard(self, user_id):
+        self.collection.delete_one({'userId': user_id})
+
+
+def evaluate_eye_samples(times, ears, ear_threshold, sleep_seconds, max_gap_seconds):
+    """Per-frame result and counter increments for the last of a window's chronological samples (NaN: no face)."""
+    closed = ears < ear_threshold  # NaN (no face) compares as open
+    valid = ~np.isnan(ears)
+
+    # Blinks: a valid open sample followed by a closed one
+    onsets = closed[1:] & ~closed[:-1] & valid[:-1]
+    span = float(times[-1] - times[0])
+    blink_rate = round(float(np.count_nonzero(onsets)) / span * 60.0, 2) if span >= 10 else None
+
+    # How long the eyes have been closed, from the first sample of the trailing closed run
+    closed_seconds = 0.0
+    if closed[-1]:
+        open_indices = np.flatnonzero(~closed)
+        run_start = open_indices[-1] + 1 if len(open_indices) else 0
+        closed_seconds = float(times[-1] - times[run_start])
+
+    ear = None if np.isnan(ears[-1]) else float(ears[-1])
+    if ear is None:
+        state, status = 'no_face', 'No Face'
+    else:
+        state = 'closed' if closed[-1] else 'open'
+        status = 'Sleeping' if closed[-1] and closed_seconds >= sleep_seconds else 'Active'
+
+    # Time between two consecutive face samples counts towards the observed time (blink rate in the report)
+    observed, blinked = 0.0, False
+    if len(times) > 1 and ear is not None and valid[-2]:
+        gap = float(times[-1] - times[-2])
+        observed = gap if 0 <= gap <= max_gap_seconds else 0.0
+        blinked = bool(onsets[-1])
+
+    result = {
+        'status': status,
+        'state': state,
+        'ear': None if ear is None else round(ear, 4),
+        'closed_seconds': round(closed_seconds, 2),
+        'blink_rate': blink_rate
+    }
+    return result, {'status': status, 'blinks': int(blinked), 'observed_seconds': observed}
+
+
+def landmarks_to_array(shape, indices=range(68)):
+    """(N, 2) float32 array of a dlib full_object_detection's points, filled without intermediate tuples."""
+    coords = itertools.chain.from_iterable((point.x, point.y) for point in map(shape.part, indices))
+    return np.fromiter(coords, dtype=np.float32, count=2 * len(indices)).reshape(-1, 2)
+
+
+def eye_aspect_ratio(eyes):
+    """EAR of each (6, 2) eye contour in `eyes` (shape (..., 6, 2)).
+
+    EAR = (|p2 - p6| + |p3 - p5|) / (2 |p1 - p4|); it drops towards 0 as the eye closes.
+    """
+    eyes = np.asarray(eyes, dtype=np.float32)
+    vertical = np.linalg.norm(eyes[..., [1, 2], :] - eyes[..., [5, 4], :], axis=-1).sum(axis=-1)
+    horizontal = np.linalg.norm(eyes[..., 0, :] - eyes[..., 3, :], axis=-1)
+    return vertical / (2.0 * np.maximum(horizontal, 1e-6))
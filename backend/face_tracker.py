@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+
+# Minimum standard deviation (0-255 scale) of a face template for it to be tracked
+MIN_TEMPLATE_CONTRAST = 4.0
+
+
+class FaceTracker:
+    """Per-candidate face localisation: a full detector every few frames, template tracking in between.
+
+    After a detection, each face is kept as a small grayscale template. On the
+    following frames it is searched for with normalised cross-correlation in
+    a window around its last position, which costs a fraction of a detector
+    pass. The detector runs again after `redetect_every` frames, when any
+    face's match score drops below `min_confidence`, when no face was found,
+    or when the frame size changes. Tracked boxes keep their detected size.
+    """
+
+    def __init__(self, redetect_every=10, min_confidence=0.6, search_margin=0.5, template_width=48):
+        self.redetect_every = max(1, int(redetect_every))
+        self.min_confidence = min_confidence
+        self.search_margin = search_margin
+        self.template_width = template_width
+        self.confidence = None  # lowest match score of the last tracked frame
+        self._tracks = []       # [(box, template, scale)]
+        self._frame_shape = None
+        self._since_detect = 0
+
+    def locate(self, gray, detect):
+        """(boxes, tracked) for a grayscale frame; `detect(gray)` is the full detector returning (x, y, w, h) boxes."""
+        if self._tracks and self._since_detect < self.redetect_every and gray.shape == self._frame_shape:
+            boxes = self._track(gray)
+            if boxes is not None:
+                self._since_detect += 1
+                return boxes, True
+
+        boxes = detect(gray)
+        self._reset(gray, boxes)
+        return boxes, False
+
+    def _reset(self, gray, boxes):
+        self._frame_shape = gray.shape
+        self._since_detect = 0
+        self.confidence = None
+        self._tracks = []
+        for box in boxes:
+            x, y, w, h = (int(v) for v in box)
+            if w < 2 or h < 2:
+                continue
+            scale = min(1.0, self.template_width / float(w))
+            template = _resize(gray[y:y + h, x:x + w], scale)
+            if template.std() < MIN_TEMPLATE_CONTRAST:
+                # Correlation with a flat template always scores 1, so such faces are never tracked
+                self._tracks = []
+                return
+            self._tracks.append(((x, y, w, h), template, scale))
+
+    def _track(self, gray):
+        height, width = gray.shape[:2]
+        tracks, scores = [], []
+        for (x, y, w, h), template, scale in self._tracks:
+            # Search a window around the last position, at the template's scale
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x1, y1 = max(0, x - mx), max(0, y - my)
+            x2, y2 = min(width, x + w + mx), min(height, y + h + my)
+            window = _resize(gray[y1:y2, x1:x2], scale)
+            if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+                return None
+
+            scores_map = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores_map)
+            # A flat template or window has no defined correlation
+            if not np.isfinite(score) or score < self.min_confidence:
+                self.confidence = float(score) if np.isfinite(score) else 0.0
+                return None
+
+            nx = min(max(0, x1 + int(round(dx / scale))), width - w)
+            ny = min(max(0, y1 + int(round(dy / scale))), height - h)
+            tracks.append(((nx, ny, w, h), template, scale))
+            scores.append(score)
+
+        # Templates stay the ones taken at detection time, so tracking does not drift between detections
+        self._tracks = tracks
+        self.confidence = float(min(scores))
+        return [box for box, _, _ in tracks]
+
+
+def _resize(image, scale):
+    if scale == 1.0:
+        return image
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
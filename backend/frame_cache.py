@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+SIGNATURE_SIZE = (32, 24)
+# Face crops are compared at the emotion model's input size, so expression changes stay visible
+FACE_SIGNATURE_SIZE = (48, 48)
+
+
+class FrameChangeCache:
+    """Reuses an analyzer's last result for a session while its input stays (nearly) the same.
+
+    The input is reduced to a small grayscale signature (the whole frame for
+    the posture CNN, the face crops for emotion); if the mean absolute difference from
+    the signature of the last analyzed input is at most the analyzer's
+    threshold (0-255 scale) and that analysis is younger than
+    `max_staleness_seconds`, the previous result is returned instead of
+    running the models again. `thresholds` overrides `threshold` per analyzer;
+    a threshold of 0 disables the cache for it. Ages are measured on the
+    monotonic clock unless the caller passes `now` (e.g. the position in a
+    recorded video, which is analyzed much faster than real time).
+
+    The whole-frame default of 4.0 sits above the noise of a still webcam
+    scene, which area averaging down to 32x24 brings well below 1. It is only
+    meant to catch changes of the whole upper body (leaning, slouching,
+    moving in the chair). Anything confined to a part of the frame moves the
+    whole-frame mean much less: a raised hand covering ~6% of the frame by ~50
+    levels gives ~3, and the eyes or mouth far less. Such signals are never
+    reused from a whole-frame match; they are checked on every frame or
+    compared on a signature of their own region.
+    """
+
+    def __init__(self, threshold=4.0, max_staleness_seconds=10.0, max_size=10000, thresholds=None):
+        self.threshold = threshold
+        self.thresholds = dict(thresholds or {})
+        self.max_staleness = max_staleness_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (analyzer, userId) -> (signature, result, analyzed_at)
+        self._lock = threading.Lock()
+
+    def enabled(self, analyzer):
+        return self.threshold_for(analyzer) > 0
+
+    def threshold_for(self, analyzer):
+        return self.thresholds.get(analyzer, self.threshold)
+
+    def lookup(self, analyzer, user_id, signature, now=None):
+        """The cached result if `signature` matches the last analyzed input closely enough, else None."""
+        if not self.enabled(analyzer):
+            return None
+        key = (analyzer, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+
+        previous, result, analyzed_at = entry
+        age = (time.monotonic() if now is None else now) - analyzed_at
+        if not 0 <= age <= self.max_staleness or previous.shape != signature.shape:
+            return None
+        if frame_difference(previous, signature) > self.threshold_for(analyzer):
+            return None
+        return result
+
+    def store(self, analyzer, user_id, signature, result, now=None):
+        if not self.enabled(analyzer):
+            return
+        with self._lock:
+            self._entries[(analyzer, user_id)] = (signature, result, time.monotonic() if now is None else now)
+            self._entries.move_to_end((analyzer, user_id))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == user_id]:
+                del self._entries[key]
+
+
+def frame_signature(gray):
+    """Downsampled grayscale thumbnail used to compare consecutive frames."""
+    return cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def face_signature(gray, boxes):
+    """Stacked thumbnails of the face crops in `boxes` (x, y, w, h), or None without a usable face.
+
+    Signatures of a different number of faces never match.
+    """
+    thumbnails = []
+    for x, y, w, h in (map(int, box) for box in boxes):
+        crop = gray[max(0, y):y + h, max(0, x):x + w]
+        if crop.size == 0:
+            return None
+        thumbnails.append(cv2.resize(crop, FACE_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA))
+    return np.stack(thumbnails) if thumbnails else None
+
+
+def frame_difference(a, b):
+    """Mean absolute pixel difference between two signatures."""
+    return float(np.mean(cv2.absdiff(a, b)))
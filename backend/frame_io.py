@@ -0,0 +1,99 @@
+import base64
+import io
+
+import cv2
+import numpy as np
+
+from metrics import stage
+
+# Content types whose body is the encoded image itself
+RAW_IMAGE_TYPES = {'image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'application/octet-stream'}
+
+
+def read_frame_upload(req, default_user_id='guest_user', pipeline='frame'):
+    """Read a frame from a Flask request and return (frame, user_id).
+
+    Accepts a raw image body (userId in the query string or X-User-Id header),
+    a multipart upload with an `image` file part, or the legacy JSON body with a
+    base64 data URL in `image`. `frame` is None when no image could be decoded.
+    Body reading and image decoding are timed as stages of `pipeline`.
+    """
+    with stage(pipeline, 'read_body'):
+        buffer, user_id = _read_frame_body(req, default_user_id)
+    with stage(pipeline, 'imdecode'):
+        return decode_frame(buffer), user_id
+
+
+def _read_frame_body(req, default_user_id):
+    if req.mimetype in RAW_IMAGE_TYPES:
+        user_id = req.args.get('userId') or req.headers.get('X-User-Id') or default_user_id
+        return _read_stream(req.stream, req.content_length), user_id
+
+    if req.mimetype == 'multipart/form-data':
+        user_id = req.form.get('userId') or req.args.get('userId') or default_user_id
+        upload = req.files.get('image')
+        return (None if upload is None else _read_upload(upload)), user_id
+
+    data = req.get_json(silent=True) or {}
+    return decode_data_url(data.get('image')), data.get('userId', default_user_id)
+
+
+async def read_frame_bytes_async(req, default_user_id='guest_user'):
+    """Async (Quart) counterpart of read_frame_upload returning (encoded image buffer, user_id).
+
+    Decoding is left to the caller so it can run on an executor instead of the event loop.
+    """
+    if req.mimetype in RAW_IMAGE_TYPES:
+        user_id = req.args.get('userId') or req.headers.get('X-User-Id') or default_user_id
+        return await req.get_data(), user_id
+
+    if req.mimetype == 'multipart/form-data':
+        form = await req.form
+        files = await req.files
+        user_id = form.get('userId') or req.args.get('userId') or default_user_id
+        upload = files.get('image')
+        return (None if upload is None else _read_upload(upload)), user_id
+
+    data = await req.get_json(silent=True) or {}
+    return decode_data_url(data.get('image')), data.get('userId', default_user_id)
+
+
+def decode_data_url(image_data):
+    """Decode a base64 image string, with or without its data:image/...;base64, prefix."""
+    if not image_data:
+        return None
+    # Remove the data:image/jpeg;base64, part
+    return base64.b64decode(image_data[image_data.find(',') + 1:])
+
+
+def decode_frame(buffer):
+    """Decode an encoded image buffer (bytes, bytearray or memoryview) into a BGR frame."""
+    if buffer is None or len(buffer) == 0:
+        return None
+    # np.frombuffer wraps the buffer without copying it
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _read_stream(stream, length):
+    """Read the request body into a single preallocated buffer."""
+    if not length or not hasattr(stream, 'readinto'):
+        return stream.read()
+
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        count = stream.readinto(view[received:])
+        if not count:
+            break
+        received += count
+    return view[:received]
+
+
+def _read_upload(upload):
+    stream = upload.stream
+    # Small uploads are kept in memory by Werkzeug, so expose that buffer directly
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer()
+    stream.seek(0)
+    return stream.read()
@@ -0,0 +1,82 @@
+"""Gunicorn settings for the pre-fork multi-worker mode.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app (TensorFlow, the posture model, MediaPipe, DeepFace) is imported once
+in the master and the workers are forked from it, so model weights are shared
+copy-on-write instead of loaded once per worker. Per-candidate state lives in
+MongoDB (stats, tab activity, eye blink history, materialized reports), so any
+worker can serve any request. What stays per worker is either a cache that is
+checked against MongoDB (reports, running posture totals) or can be rebuilt
+from the next frame (pose and face trackers, which re-detect whenever tracking
+is unsure, frame-change cache, admission queue); WebSocket sessions stay on
+the worker that accepted them. This needs a real MongoDB:
+the mongomock:// stand-in lives inside each process.
+
+Settings: SERVER_WORKERS (default: CPU count), SERVER_THREADS (8),
+SERVER_BIND (0.0.0.0:5000), SERVER_PRELOAD (1; set 0 to load the models in
+every worker instead, e.g. if a model runtime misbehaves after fork).
+"""
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+workers = int(os.getenv('SERVER_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('SERVER_THREADS', 8))
+worker_class = 'gthread'  # flask-sock needs threaded workers
+bind = os.getenv('SERVER_BIND', '0.0.0.0:5000')
+preload_app = os.getenv('SERVER_PRELOAD', '1') == '1'
+timeout = 120
+graceful_timeout = 30
+
+# Read by app.py to switch per-process caches to their multi-worker behaviour
+os.environ['SERVER_WORKERS'] = str(workers)
+
+# Models are loaded in the master but warmed up in each worker (post_fork), since
+# running inference before forking would start runtime threads the workers cannot use
+os.environ.setdefault('MODEL_LOADING', 'preload' if preload_app else 'background')
+
+# Split the cores between workers instead of every worker's TF/OpenMP pools using all of them
+intra_op_threads = str(max(1, multiprocessing.cpu_count() // max(1, workers)))
+os.environ.setdefault('TF_NUM_INTRAOP_THREADS', intra_op_threads)
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+os.environ.setdefault('OMP_NUM_THREADS', intra_op_threads)
+
+# Prometheus samples from every worker are written here and combined by /metrics
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='hiringguru-metrics-')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+for stale_file in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+    os.remove(stale_file)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import app as core
+    core.prepare_for_fork()
+
+    # Move everything allocated so far out of the collector's reach, so GC passes in the
+    # workers do not touch (and copy) the pages holding the shared models
+    gc.collect()
+    gc.freeze()
+    server.log.info("Models loaded in the master; forking %s workers", workers)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app as core
+        core.connect_after_fork()
+        core.model_registry.start()
+
+
+def worker_exit(server, worker):
+    import app as core
+    core.stats_buffer.close()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,384 @@
+"""Load test: N simulated candidates hitting the backend at the frontend's cadence.
+
+Each candidate signs up, logs in and then, like FacialExpression.tsx and
+TabTracker.tsx, sends a webcam frame to /api/analyze-emotion-ml every 3s
+(plus /api/analyze-emotion when the emotion changes), a frame to
+/api/analyze-posture every 5s, polls /api/get-tab-activity every 10s and
+posts tab visibility changes. At the end every candidate fetches its report.
+
+In-process against the in-memory Mongo stand-in (loads the real models):
+    python loadtest.py --candidates 50 --duration 120 --frames recorded_frames/
+
+Against a running server:
+    python loadtest.py --url http://localhost:5000 --candidates 200 --duration 300
+
+Latency is measured from when a request was due, so client-side queueing
+behind a slow server is counted instead of hidden.
+"""
+import argparse
+import base64
+import glob
+import heapq
+import http.client
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+
+class HttpClient:
+    """Keep-alive HTTP client with one connection per worker thread."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = self.connection_class(self.host, timeout=self.timeout)
+            try:
+                connection.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # Stale keep-alive connection; reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+
+class InProcessClient:
+    """Calls the Flask app directly through its test client (one per worker thread)."""
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, data=body, headers=headers or {})
+        return response.status_code, response.get_data()
+
+
+class Recorder:
+    """Latencies, status codes and errors per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.shed = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency_ms, status):
+        with self._lock:
+            self.latencies[endpoint].append(latency_ms)
+            self.statuses[endpoint][status] += 1
+            if status == 429:  # dropped by admission control, not a failure
+                self.shed[endpoint] += 1
+            elif status is None or status >= 400:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        for endpoint in sorted(self.latencies):
+            values = np.asarray(self.latencies[endpoint])
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            rows[endpoint] = {
+                'requests': int(values.size),
+                'errors': self.errors[endpoint],
+                'shed': self.shed[endpoint],
+                'throughput_rps': round(values.size / elapsed, 2),
+                'p50_ms': round(float(p50), 1),
+                'p95_ms': round(float(p95), 1),
+                'p99_ms': round(float(p99), 1),
+                'max_ms': round(float(values.max()), 1),
+                'statuses': {str(status): count for status, count in self.statuses[endpoint].items()}
+            }
+        return rows
+
+
+class Candidate:
+    def __init__(self, index, frame_offset):
+        self.index = index
+        self.email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        self.user_id = None
+        self.frame_index = frame_offset
+        self.last_emotion = None
+        self.hidden = False
+
+
+class LoadTest:
+    def __init__(self, client, frames, args, tab_script=None):
+        self.client = client
+        self.frames = frames
+        self.args = args
+        self.tab_script = tab_script
+        self.recorder = Recorder()
+        self.speed = args.speed
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._random = random.Random(args.seed)
+
+    # Scheduling
+
+    def schedule(self, due, candidate, action, *extra):
+        with self._condition:
+            heapq.heappush(self._heap, (due, next(self._sequence), candidate, action, extra))
+            self._condition.notify()
+
+    def run(self):
+        candidates = self.setup_candidates()
+        start = time.monotonic()
+        end = start + self.args.duration
+        for candidate in candidates:
+            self.schedule_candidate(candidate, start)
+
+        with ThreadPoolExecutor(max_workers=self.args.max_inflight, thread_name_prefix='loadtest') as pool:
+            while True:
+                with self._condition:
+                    while True:
+                        now = time.monotonic()
+                        if self._heap and self._heap[0][0] <= now:
+                            due, _, candidate, action, extra = heapq.heappop(self._heap)
+                            break
+                        if now >= end:
+                            due = None
+                            break
+                        timeout = (self._heap[0][0] if self._heap else end) - now
+                        self._condition.wait(min(timeout, end - now))
+                if due is None:
+                    break
+                if due < end:
+                    pool.submit(self._run_action, due, candidate, action, extra)
+
+        elapsed = time.monotonic() - start
+        for candidate in candidates:
+            self.timed_request('report', time.monotonic(), 'GET',
+                               f'/api/generate-interview-report?userId={candidate.user_id}')
+        return elapsed
+
+    def schedule_candidate(self, candidate, start):
+        # Stagger candidates across the first interval, as real sessions do not start in lockstep
+        for action, interval in (('emotion', self.args.emotion_interval),
+                                 ('posture', self.args.posture_interval),
+                                 ('tab_poll', self.args.tab_poll_interval)):
+            offset = self._random.uniform(0, interval / self.speed)
+            self.schedule(start + offset, candidate, action)
+        if self.tab_script:
+            shift = self._random.uniform(0, self.args.tab_poll_interval / self.speed)
+            for event in self.tab_script:
+                self.schedule(start + shift + event['offset_ms'] / 1000.0 / self.speed, candidate, 'tab_event',
+                              event['status'])
+
+    def _run_action(self, due, candidate, action, extra):
+        try:
+            getattr(self, 'do_' + action)(due, candidate, *extra)
+        except Exception as e:
+            print(f"Error in {action} for candidate {candidate.index}: {e}")
+
+    # Candidate behaviour
+
+    def wait_until_ready(self, timeout=300):
+        """Models load in the background after a restart; wait for /readyz before measuring."""
+        deadline = time.monotonic() + timeout
+        while True:
+            status, body = self.client.request('GET', '/readyz?analyzers=emotion,pose,posture')
+            if status == 200:
+                return
+            analyzers = json.loads(body).get('analyzers', {}) if status == 503 else {}
+            if time.monotonic() >= deadline or any(a.get('state') == 'failed' for a in analyzers.values()):
+                raise SystemExit(f"Server not ready after {timeout}s: {body[:500]!r}")
+            time.sleep(1)
+
+    def setup_candidates(self):
+        """Sign up and log in every candidate before the clock starts (not measured)."""
+        self.wait_until_ready()
+        frame_count = len(self.frames)
+        candidates = [Candidate(i, self._random.randrange(frame_count)) for i in range(self.args.candidates)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(self.login, candidates))
+        print(f"{len(candidates)} candidates signed in", flush=True)
+        return candidates
+
+    def login(self, candidate):
+        credentials = {'name': f'Candidate {candidate.index}', 'email': candidate.email, 'password': 'loadtest'}
+        for path in ('/api/auth/signup', '/api/auth/login'):
+            for _ in range(20):
+                status, body = self.post_json(path, credentials)
+                if status != 503:  # bcrypt pool busy
+                    break
+                time.sleep(0.5)
+        if status != 200:
+            raise RuntimeError(f"Login failed for {candidate.email}: {status} {body[:200]!r}")
+        candidate.user_id = json.loads(body)['userId']
+
+    def do_emotion(self, due, candidate):
+        self.schedule(due + self.args.emotion_interval / self.speed, candidate, 'emotion')
+        status, body = self.send_frame('emotion', due, '/api/analyze-emotion-ml', candidate)
+        if status == 200:
+            emotion = json.loads(body).get('emotion')
+            # The frontend only stores the emotion when it changes
+            if emotion and emotion != candidate.last_emotion:
+                candidate.last_emotion = emotion
+                self.timed_request('emotion_stats', time.monotonic(), 'POST', '/api/analyze-emotion',
+                                   {'userId': candidate.user_id, 'emotion': emotion})
+
+    def do_posture(self, due, candidate):
+        self.schedule(due + self.args.posture_interval / self.speed, candidate, 'posture')
+        self.send_frame('posture', due, '/api/analyze-posture', candidate)
+
+    def do_tab_poll(self, due, candidate):
+        self.schedule(due + self.args.tab_poll_interval / self.speed, candidate, 'tab_poll')
+        self.timed_request('tab_activity', due, 'GET', f'/api/get-tab-activity?userId={candidate.user_id}')
+
+        # Without a recorded script, switch away now and then and come back a few seconds later
+        if not self.tab_script and not candidate.hidden and self._random.random() < self.args.tab_switch_probability:
+            away = self._random.uniform(1, self.args.tab_poll_interval)
+            self.do_tab_event(due, candidate, 'hidden')
+            self.schedule(due + away / self.speed, candidate, 'tab_event', 'visible')
+
+    def do_tab_event(self, due, candidate, status):
+        candidate.hidden = status == 'hidden'
+        self.timed_request('tab', due, 'POST', '/api/track-tab-activity',
+                           {'userId': candidate.user_id, 'status': status, 'timestamp': int(time.time() * 1000)})
+
+    # Requests
+
+    def send_frame(self, endpoint, due, path, candidate):
+        frame = self.frames[candidate.frame_index % len(self.frames)]
+        candidate.frame_index += 1
+        if self.args.payload == 'raw':
+            return self.timed_request(endpoint, due, 'POST', f'{path}?userId={candidate.user_id}', raw=frame['jpeg'])
+        # Same body the browser sends: a canvas.toDataURL() JPEG in JSON
+        return self.timed_request(endpoint, due, 'POST', path,
+                                  {'image': frame['data_url'], 'userId': candidate.user_id})
+
+    def post_json(self, path, payload):
+        return self.client.request('POST', path, json.dumps(payload).encode('utf-8'),
+                                   {'Content-Type': 'application/json'})
+
+    def timed_request(self, endpoint, due, method, path, payload=None, raw=None):
+        status, body = None, b''
+        try:
+            if raw is not None:
+                status, body = self.client.request(method, path, raw, {'Content-Type': 'image/jpeg'})
+            elif payload is not None:
+                status, body = self.post_json(path, payload)
+            else:
+                status, body = self.client.request(method, path)
+        except Exception as e:
+            print(f"{endpoint} request failed: {e}")
+        finally:
+            self.recorder.record(endpoint, (time.monotonic() - due) * 1000, status)
+        return status, body
+
+
+def load_frames(frames_dir, count=20, size=(640, 480), quality=80):
+    """Recorded webcam frames from `frames_dir` (re-encoded as the browser would), or synthetic ones."""
+    images = []
+    if frames_dir:
+        for path in sorted(glob.glob(os.path.join(frames_dir, '*'))):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                images.append(image)
+        if not images:
+            raise SystemExit(f"No readable images in {frames_dir}")
+    else:
+        width, height = size
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (31, 31), 0)
+        for i in range(count):
+            image = base.copy()
+            # A slowly drifting bright blob stands in for the candidate moving in front of the camera
+            center = (width // 2 + int(20 * np.sin(i / 3)), height // 2 + int(10 * np.cos(i / 4)))
+            cv2.ellipse(image, center, (90, 120), 0, 0, 360, (180, 190, 210), -1)
+            images.append(image)
+
+    frames = []
+    for image in images:
+        jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        frames.append({'jpeg': jpeg, 'data_url': 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')})
+    return frames
+
+
+def load_tab_script(path):
+    """Recorded tab events: a JSON list of {"offset_ms": ..., "status": "hidden"|"visible"}."""
+    with open(path, encoding='utf-8') as f:
+        events = json.load(f)
+    return sorted(events, key=lambda event: event['offset_ms'])
+
+
+def create_in_process_client():
+    # Must be set before app.py connects to MongoDB
+    os.environ['MONGO_URI'] = os.getenv('LOADTEST_MONGO_URI', 'mongomock://loadtest')
+    os.environ.setdefault('BCRYPT_ROUNDS', '4')  # sign-up is setup, not what is being measured
+    import app as core
+    return InProcessClient(core.app)
+
+
+def print_summary(rows, elapsed):
+    print(f"\nElapsed: {elapsed:.1f}s")
+    header = f"{'endpoint':<16}{'requests':>9}{'errors':>8}{'shed':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for endpoint, row in rows.items():
+        print(f"{endpoint:<16}{row['requests']:>9}{row['errors']:>8}{row['shed']:>7}{row['throughput_rps']:>9}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server; omit to run in-process with in-memory Mongo')
+    parser.add_argument('--candidates', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of steady-state load')
+    parser.add_argument('--speed', type=float, default=1.0, help='Run the cadence this many times faster')
+    parser.add_argument('--emotion-interval', type=float, default=3.0)
+    parser.add_argument('--posture-interval', type=float, default=5.0)
+    parser.add_argument('--tab-poll-interval', type=float, default=10.0)
+    parser.add_argument('--tab-switch-probability', type=float, default=0.05,
+                        help='Chance per tab poll that a candidate switches away (without --tab-events)')
+    parser.add_argument('--frames', help='Directory of recorded webcam frames to replay')
+    parser.add_argument('--tab-events', help='JSON file of recorded tab events to replay for every candidate')
+    parser.add_argument('--payload', choices=['json', 'raw'], default='json',
+                        help='json: base64 data URL like the frontend; raw: JPEG request body')
+    parser.add_argument('--max-inflight', type=int, default=256, help='Client-side concurrent request limit')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Also write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    tab_script = load_tab_script(args.tab_events) if args.tab_events else None
+    client = HttpClient(args.url) if args.url else create_in_process_client()
+
+    test = LoadTest(client, frames, args, tab_script)
+    elapsed = test.run()
+    rows = test.recorder.summary(elapsed)
+    print_summary(rows, elapsed)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'elapsed_seconds': round(elapsed, 2), 'endpoints': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
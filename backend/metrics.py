@@ -0,0 +1,130 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+import tracing
+
+# Frame stages run from ~1ms (imdecode) to a few hundred ms (pose, CNN on CPU)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter('hiringguru_requests_total', 'HTTP requests handled', ['handler', 'status'])
+ERRORS = Counter('hiringguru_request_errors_total', 'HTTP requests that ended in a 5xx or an exception',
+                 ['handler'])
+IN_FLIGHT = Gauge('hiringguru_requests_in_flight', 'HTTP requests currently being handled', ['handler'],
+                  multiprocess_mode='livesum')
+REQUEST_LATENCY = Histogram('hiringguru_request_duration_seconds', 'End-to-end handler latency',
+                            ['handler'], buckets=REQUEST_BUCKETS)
+STAGE_LATENCY = Histogram('hiringguru_stage_duration_seconds', 'Latency of each pipeline stage',
+                          ['pipeline', 'stage'], buckets=STAGE_BUCKETS)
+STAGE_ERRORS = Counter('hiringguru_stage_errors_total', 'Pipeline stages that raised', ['pipeline', 'stage'])
+FRAME_CACHE = Counter('hiringguru_frame_cache_total', 'Frames answered from the previous result (hit) or analyzed',
+                      ['pipeline', 'result'])
+FACE_LOCATE = Counter('hiringguru_face_locate_total', 'Face localisations by the full detector or the tracker',
+                      ['pipeline', 'method'])
+POSTURE_BATCH_SIZE = Histogram('hiringguru_posture_batch_size', 'Frames per posture model call',
+                               buckets=(1, 2, 4, 8, 16, 32, 64))
+
+
+@contextmanager
+def stage(pipeline, name):
+    """Time one step of a pipeline (e.g. stage('posture', 'pose')) into STAGE_LATENCY and the current trace."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        STAGE_ERRORS.labels(pipeline, name).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels(pipeline, name).observe(duration)
+        tracing.add_span(f"{pipeline}.{name}", start, duration, failed)
+
+
+def observe_posture_batch(size):
+    POSTURE_BATCH_SIZE.observe(size)
+
+
+def observe_frame_cache(pipeline, hit):
+    FRAME_CACHE.labels(pipeline, 'hit' if hit else 'miss').inc()
+
+
+def observe_face_locate(pipeline, tracked):
+    FACE_LOCATE.labels(pipeline, 'track' if tracked else 'detect').inc()
+
+
+def instrument(handler):
+    """Decorator for Flask views: count requests by status, errors and in-flight, time the handler,
+    and trace/profile it through the tracing module."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import make_response
+
+            in_flight = IN_FLIGHT.labels(handler)
+            in_flight.inc()
+            start = time.perf_counter()
+            status = 500
+            try:
+                with tracing.request_trace(handler, view.__name__) as trace:
+                    response = make_response(view(*args, **kwargs))
+                    status = response.status_code
+                    if trace is not None:
+                        trace.status = status
+                return response
+            finally:
+                _finish(handler, status, start)
+                in_flight.dec()
+        return wrapper
+    return decorator
+
+
+def instrument_async(handler):
+    """Same as instrument() for Quart views."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            from quart import make_response
+
+            in_flight = IN_FLIGHT.labels(handler)
+            in_flight.inc()
+            start = time.perf_counter()
+            status = 500
+            try:
+                # cProfile would also sample every other task on the loop, so async views are only traced
+                with tracing.request_trace(handler, view.__name__, profile=False) as trace:
+                    response = await make_response(await view(*args, **kwargs))
+                    status = response.status_code
+                    if trace is not None:
+                        trace.status = status
+                return response
+            finally:
+                _finish(handler, status, start)
+                in_flight.dec()
+        return wrapper
+    return decorator
+
+
+def _finish(handler, status, start):
+    REQUEST_LATENCY.labels(handler).observe(time.perf_counter() - start)
+    REQUESTS.labels(handler, str(status)).inc()
+    if status >= 500:
+        ERRORS.labels(handler).inc()
+
+
+def render_metrics():
+    """(body, content type) in the Prometheus text exposition format.
+
+    Under gunicorn (PROMETHEUS_MULTIPROC_DIR set) the samples of every worker are combined.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
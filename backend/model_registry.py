@@ -0,0 +1,131 @@
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+
+class ModelNotReadyError(Exception):
+    """Raised when an analyzer's model is still loading (or failed to load)."""
+
+    def __init__(self, name, state):
+        super().__init__(f"Model '{name}' is not ready ({state})")
+        self.name = name
+        self.state = state
+
+
+class ModelRegistry:
+    """Loads the analyzers' models off the request path and reports which ones are ready.
+
+    Each model has a loader (imports its framework and builds the model) and an
+    optional warm-up that runs one inference so the first real request does not
+    pay for lazy initialisation. A model is served only once it is 'ready'.
+    """
+
+    def __init__(self):
+        self._specs = OrderedDict()  # name -> (loader, warmup)
+        self._models = {}
+        self._state = {}
+        self._errors = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, loader, warmup=None):
+        with self._lock:
+            self._specs[name] = (loader, warmup)
+            self._state[name] = 'pending'
+            self._timings[name] = {}
+
+    def get(self, name):
+        """The loaded model, or ModelNotReadyError."""
+        state = self._state.get(name, 'unknown')
+        if state != 'ready':
+            raise ModelNotReadyError(name, state)
+        return self._models[name]
+
+    def require(self, *names):
+        """Raise ModelNotReadyError for the first of `names` that is not ready."""
+        for name in names:
+            state = self._state.get(name, 'unknown')
+            if state != 'ready':
+                raise ModelNotReadyError(name, state)
+
+    def is_ready(self, *names):
+        names = names or tuple(self._specs)
+        return all(self._state.get(name) == 'ready' for name in names)
+
+    def status(self):
+        with self._lock:
+            status = {}
+            for name in self._specs:
+                entry = {'state': self._state[name], **self._timings[name]}
+                if name in self._errors:
+                    entry['error'] = self._errors[name]
+                status[name] = entry
+            return status
+
+    def load_all(self):
+        """Load every model on the calling thread, without warming up (e.g. in a pre-fork master)."""
+        for name in list(self._specs):
+            self._load(name)
+
+    def start(self):
+        """Load (if needed) and warm up every model on a background thread."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def wait_ready(self, timeout=None):
+        """Block until every model is ready or has failed; returns is_ready()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(state in ('ready', 'failed') for state in self._state.values()):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        return self.is_ready()
+
+    def _run(self):
+        for name in list(self._specs):
+            if self._load(name):
+                self._warm_up(name)
+
+    def _load(self, name):
+        if self._state[name] in ('loaded', 'warming', 'ready'):
+            return True
+        loader, _ = self._specs[name]
+        self._state[name] = 'loading'
+        print(f"🔁 Loading {name} model...", flush=True)
+        started = time.perf_counter()
+        try:
+            self._models[name] = loader()
+        except Exception as e:
+            traceback.print_exc()
+            self._fail(name, e)
+            return False
+        self._timings[name]['load_seconds'] = round(time.perf_counter() - started, 3)
+        self._state[name] = 'loaded'
+        return True
+
+    def _warm_up(self, name):
+        _, warmup = self._specs[name]
+        self._state[name] = 'warming'
+        started = time.perf_counter()
+        try:
+            if warmup is not None:
+                warmup(self._models[name])
+        except Exception as e:
+            traceback.print_exc()
+            self._fail(name, e)
+            return
+        self._timings[name]['warmup_seconds'] = round(time.perf_counter() - started, 3)
+        self._state[name] = 'ready'
+        print(f"✅ {name} model ready", flush=True)
+
+    def _fail(self, name, error):
+        print(f"❌ Failed to load {name} model: {error}", flush=True)
+        with self._lock:
+            self._errors[name] = str(error)
+            self._state[name] = 'failed'
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+
+class AuthBusyError(Exception):
+    """Raised when the hashing pool is full or a hash did not finish in time."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated pool so bursts of logins cannot starve frame analysis.
+
+    At most `max_workers` hashes run at once and at most `max_queue` more may
+    wait; anything beyond that is rejected immediately with AuthBusyError.
+    """
+
+    def __init__(self, max_workers=2, max_queue=32, timeout_seconds=5.0, rounds=12):
+        self.rounds = rounds
+        self.timeout = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def hash(self, password):
+        """Return the bcrypt hash of `password` as a str."""
+        return self._run(_hash_password, password, self.rounds)
+
+    def verify(self, password, hashed):
+        """Check `password` against a stored bcrypt hash."""
+        return self._run(_check_password, password, hashed)
+
+    async def hash_async(self, password):
+        """Async variant of hash() for the async serving mode; never blocks the event loop."""
+        return await self._run_async(_hash_password, password, self.rounds)
+
+    async def verify_async(self, password, hashed):
+        """Async variant of verify()."""
+        return await self._run_async(_check_password, password, hashed)
+
+    def _run(self, fn, *args):
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise AuthBusyError('Authentication timed out')
+
+    async def _run_async(self, fn, *args):
+        future = asyncio.wrap_future(self._submit(fn, *args))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise AuthBusyError('Authentication timed out')
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusyError('Too many authentication requests in progress')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def _hash_password(password, rounds):
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def _check_password(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
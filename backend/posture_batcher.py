@@ -0,0 +1,76 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class PostureBatcher:
+    """Collects preprocessed frames from concurrent requests and runs them through the model as one batch."""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10, on_batch=None):
+        # predict_fn takes an (N, H, W, C) array and returns N probabilities (or an (N, 1) array)
+        self.predict_fn = predict_fn
+        # on_batch(size) is called before each model call, e.g. to record batch sizes
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._worker_pid = None
+
+    def predict(self, img, timeout=None):
+        """Queue a single preprocessed frame and block until its probability is ready."""
+        future = Future()
+        self._ensure_worker().put((img, future))
+        return future.result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # The worker thread is started lazily (and restarted in forked children),
+        # since threads do not survive a fork.
+        pid = os.getpid()
+        if self._worker_pid == pid and self._worker is not None and self._worker.is_alive():
+            return self._queue
+        with self._lock:
+            if self._worker_pid != pid or self._worker is None or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="posture-batcher", daemon=True)
+                self._worker_pid = pid
+                self._worker.start()
+        return self._queue
+
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+
+            # Keep collecting until the batch is full or the first frame has waited long enough
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(pending.get(timeout=remaining))
+                    else:
+                        batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        if self.on_batch is not None:
+            self.on_batch(len(batch))
+        try:
+            images = np.stack([img for img, _ in batch])
+            probs = np.asarray(self.predict_fn(images), dtype=np.float32).reshape(len(batch), -1)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), prob in zip(batch, probs):
+            future.set_result(float(prob[0]))
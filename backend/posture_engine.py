@@ -0,0 +1,297 @@
+"""Posture model inference engines (Keras, TFLite, ONNX Runtime) plus a converter and a parity check.
+
+The app picks an engine with POSTURE_ENGINE (keras, tflite or onnx) and
+POSTURE_ENGINE_PATH (the converted model; defaults to MODEL_PATH with the
+engine's file extension).
+
+Convert the Keras model, optionally quantized:
+    python posture_engine.py convert posture_model.keras --to tflite --quantize float16 --frames recorded_frames/
+    python posture_engine.py convert posture_model.keras --to onnx --quantize int8 --frames calib/
+
+Check that a converted model agrees with Keras on real frames before deploying it:
+    python posture_engine.py parity posture_model.keras posture_model.tflite --frames recorded_frames/
+"""
+import argparse
+import glob
+import os
+import sys
+import threading
+import zipfile
+
+import cv2
+import numpy as np
+
+IMG_SIZE = (224, 224)
+CLASS_LABELS = ["Good Posture", "Bad Posture"]
+POSTURE_THRESHOLD = 0.65  # Best threshold found is 0.11
+
+ENGINE_EXTENSIONS = {'keras': '.keras', 'tflite': '.tflite', 'onnx': '.onnx'}
+
+
+def preprocess_posture_frame(frame, gray=None):
+    """Turn a BGR frame into a single 224x224x3 input for the posture model."""
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if gray is None else gray
+    gray_frame = cv2.GaussianBlur(gray_frame, (5, 5), 0)  # Reduce noise
+    gray_frame = cv2.cvtColor(gray_frame, cv2.COLOR_GRAY2RGB)  # Convert back to 3 channels
+    img = cv2.resize(gray_frame, IMG_SIZE)
+    return img.astype("float32") / 255.0
+
+
+class KerasEngine:
+    """The original TensorFlow/Keras model."""
+
+    name = 'keras'
+
+    def __init__(self, path):
+        self.path = path
+        print("🔁 Checking model format...", flush=True)
+        if zipfile.is_zipfile(path):
+            print("✅ Model file is a valid Keras archive", flush=True)
+        else:
+            print("❌ Model file is NOT a valid .keras archive. Try re-saving it.", flush=True)
+
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(path)
+
+    def predict_batch(self, images):
+        """Bad-posture probabilities for an (N, 224, 224, 3) float32 batch, as an (N,) array."""
+        return np.asarray(self.model.predict_on_batch(images), dtype=np.float32).reshape(len(images), -1)[:, 0]
+
+
+class TFLiteEngine:
+    """A converted .tflite model, run with tflite_runtime when installed (no full TensorFlow needed).
+
+    Resizing an interpreter's input reallocates all of its tensors, so there is
+    one interpreter per batch size bucket (powers of two up to `max_batch_size`),
+    each allocated once. A batch is zero-padded up to its bucket and larger
+    batches are run in chunks of `max_batch_size`.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, path, num_threads=None, max_batch_size=16):
+        self.path = path
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.bucket_sizes = sorted({min(2 ** i, self.max_batch_size) for i in range(self.max_batch_size.bit_length() + 1)})
+        self._interpreters = {}
+        for size in self.bucket_sizes:
+            interpreter = Interpreter(model_path=path, num_threads=num_threads)
+            input_index = interpreter.get_input_details()[0]['index']
+            interpreter.resize_tensor_input(input_index, [size] + list(IMG_SIZE) + [3])
+            interpreter.allocate_tensors()
+            self._interpreters[size] = (interpreter, interpreter.get_input_details()[0],
+                                        interpreter.get_output_details()[0])
+        # An interpreter holds its tensors in place, so calls must not overlap
+        self._lock = threading.Lock()
+
+    def predict_batch(self, images):
+        images = np.asarray(images, dtype=np.float32)
+        outputs = [self._predict_chunk(images[start:start + self.max_batch_size])
+                   for start in range(0, len(images), self.max_batch_size)]
+        return np.concatenate(outputs) if outputs else np.zeros(0, dtype=np.float32)
+
+    def _predict_chunk(self, images):
+        count = len(images)
+        size = next(size for size in self.bucket_sizes if size >= count)
+        if size > count:
+            images = np.concatenate([images, np.zeros((size - count,) + images.shape[1:], dtype=np.float32)])
+
+        interpreter, input_details, output_details = self._interpreters[size]
+        with self._lock:
+            interpreter.set_tensor(input_details['index'], _quantize(images, input_details))
+            interpreter.invoke()
+            output = _dequantize(interpreter.get_tensor(output_details['index']), output_details)
+        return output.reshape(size, -1)[:count, 0]
+
+
+class OnnxEngine:
+    """A converted .onnx model on ONNX Runtime's CPU provider."""
+
+    name = 'onnx'
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+        self.path = path
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+        self._input_type = self.session.get_inputs()[0].type
+
+    def predict_batch(self, images):
+        dtype = np.float16 if self._input_type == 'tensor(float16)' else np.float32
+        output = self.session.run(None, {self._input_name: np.asarray(images, dtype=dtype)})[0]
+        return np.asarray(output, dtype=np.float32).reshape(len(images), -1)[:, 0]
+
+
+ENGINES = {'keras': KerasEngine, 'tflite': TFLiteEngine, 'onnx': OnnxEngine}
+
+
+def create_posture_engine(model_path, engine=None, engine_path=None, num_threads=None, max_batch_size=16):
+    """Build the engine named by POSTURE_ENGINE (default keras) for the posture model.
+
+    `max_batch_size` should match the PostureBatcher's, so TFLite never runs a batch in chunks.
+    """
+    engine = (engine or os.getenv('POSTURE_ENGINE', 'keras')).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown POSTURE_ENGINE {engine!r}; expected one of {sorted(ENGINES)}")
+    if engine == 'keras':
+        return KerasEngine(model_path)
+
+    engine_path = engine_path or os.getenv('POSTURE_ENGINE_PATH') or default_engine_path(model_path, engine)
+    threads = num_threads or int(os.getenv('POSTURE_ENGINE_THREADS', 0)) or None
+    if engine == 'tflite':
+        return TFLiteEngine(engine_path, num_threads=threads, max_batch_size=max_batch_size)
+    return ENGINES[engine](engine_path, num_threads=threads)
+
+
+def default_engine_path(model_path, engine, quantize=None):
+    root, _ = os.path.splitext(model_path)
+    suffix = f'_{quantize}' if quantize else ''
+    return root + suffix + ENGINE_EXTENSIONS[engine]
+
+
+def load_engine(path):
+    """Engine for a model file, chosen by its extension (used by the CLI)."""
+    extension = os.path.splitext(path)[1].lower()
+    for name, engine_extension in ENGINE_EXTENSIONS.items():
+        if extension == engine_extension or (name == 'keras' and extension == '.h5'):
+            return ENGINES[name](path)
+    raise ValueError(f"Cannot tell the engine for {path}")
+
+
+def _quantize(images, details):
+    scale, zero_point = details.get('quantization', (0.0, 0))
+    if details['dtype'] in (np.int8, np.uint8) and scale:
+        info = np.iinfo(details['dtype'])
+        return np.clip(np.round(images / scale + zero_point), info.min, info.max).astype(details['dtype'])
+    return images.astype(details['dtype'])
+
+
+def _dequantize(output, details):
+    scale, zero_point = details.get('quantization', (0.0, 0))
+    if output.dtype in (np.int8, np.uint8) and scale:
+        return (output.astype(np.float32) - zero_point) * scale
+    return output.astype(np.float32)
+
+
+# Conversion
+
+def load_sample_batch(frames_dir):
+    """Preprocessed frames from `frames_dir` (calibration / parity data)."""
+    images = []
+    for path in sorted(glob.glob(os.path.join(frames_dir, '*'))):
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is not None:
+            images.append(preprocess_posture_frame(frame))
+    if not images:
+        raise ValueError(f"No readable frames in {frames_dir}")
+    return np.stack(images)
+
+
+def convert_to_tflite(model_path, output_path, quantize=None, calibration=None):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        # Full-integer quantization calibrated on real (preprocessed) frames; float input/output kept
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([image[np.newaxis]] for image in calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def convert_to_onnx(model_path, output_path, quantize=None):
+    import tensorflow as tf
+    import tf2onnx
+
+    model = tf.keras.models.load_model(model_path)
+    spec = (tf.TensorSpec((None,) + IMG_SIZE + (3,), tf.float32, name='image'),)
+    if quantize == 'float16':
+        from onnxconverter_common import float16
+        onnx_model, _ = tf2onnx.convert.from_keras(model, input_signature=spec)
+        tf2onnx.utils.save_protobuf(output_path, float16.convert_float_to_float16(onnx_model))
+        return
+
+    target = output_path + '.fp32' if quantize == 'int8' else output_path
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=target)
+    if quantize == 'int8':
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(target, output_path, weight_type=QuantType.QInt8)
+        os.remove(target)
+
+
+# Parity
+
+def check_parity(reference, candidate, images, tolerance=0.02, threshold=POSTURE_THRESHOLD):
+    """Compare two engines on the same batch; returns (ok, report)."""
+    expected = np.asarray(reference.predict_batch(images), dtype=np.float32)
+    actual = np.asarray(candidate.predict_batch(images), dtype=np.float32)
+    differences = np.abs(expected - actual)
+    flipped = int(np.count_nonzero((expected > threshold) != (actual > threshold)))
+    report = {
+        'frames': len(images),
+        'max_abs_diff': float(differences.max()),
+        'mean_abs_diff': float(differences.mean()),
+        'label_flips': flipped,
+        'tolerance': tolerance,
+        'threshold': threshold
+    }
+    return report['max_abs_diff'] <= tolerance and flipped == 0, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='Convert the Keras posture model')
+    convert.add_argument('model', help='Path to the .keras model')
+    convert.add_argument('--to', choices=['tflite', 'onnx'], required=True)
+    convert.add_argument('--quantize', choices=['float16', 'int8'])
+    convert.add_argument('--frames', required=True,
+                         help='Recorded frames for int8 calibration and the parity check after converting')
+    convert.add_argument('--output')
+    convert.add_argument('--tolerance', type=float, default=0.02)
+
+    parity = commands.add_parser('parity', help='Compare a converted model with the Keras model')
+    parity.add_argument('reference', help='Path to the .keras model')
+    parity.add_argument('candidate', help='Path to the converted model')
+    parity.add_argument('--frames', required=True,
+                        help='Directory of recorded interview frames to compare on (noise does not exercise the model)')
+    parity.add_argument('--tolerance', type=float, default=0.02)
+    parity.add_argument('--threshold', type=float, default=POSTURE_THRESHOLD)
+
+    args = parser.parse_args(argv)
+    images = load_sample_batch(args.frames)
+
+    if args.command == 'convert':
+        output = args.output or default_engine_path(args.model, args.to, args.quantize)
+        if args.to == 'tflite':
+            convert_to_tflite(args.model, output, args.quantize, images)
+        else:
+            convert_to_onnx(args.model, output, args.quantize)
+        print(f"✅ Wrote {output}")
+        reference, candidate, tolerance, threshold = args.model, output, args.tolerance, POSTURE_THRESHOLD
+    else:
+        reference, candidate, tolerance, threshold = args.reference, args.candidate, args.tolerance, args.threshold
+
+    ok, report = check_parity(load_engine(reference), load_engine(candidate), images, tolerance, threshold)
+    print(report)
+    print("✅ Parity check passed" if ok else "❌ Parity check failed")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from database import USER_PROFILE_FIELDS
+from stats import EYE_COUNT_FIELDS, POSTURE_COUNT_FIELDS, emotion_summary, eye_summary, posture_summary
+from stats_buffer import apply_increments
+from tab_store import TAB_MIRROR_FIELDS, tab_metrics
+
+# Bump when the shape of the materialized document changes so old copies get rebuilt
+REPORT_SCHEMA_VERSION = 2
+
+# Where each stats collection's counters live inside the report document
+REPORT_SECTIONS = {
+    'facial_expression_stats': '',      # already stored under emotions.<name>
+    'posture_stats': 'posture.',
+    'eye_stats': 'eyes.'
+}
+
+
+class ReportStore:
+    """Materialized per-user interview report, kept up to date incrementally and served with an ETag.
+
+    Stats flushes and tab events are mirrored into one `interview_reports`
+    document per user. Rendered reports are cached in memory until something
+    for that user changes, so unchanged reports are answered without MongoDB.
+
+    With `verify_cached` (several worker processes), a cached report is only
+    reused while the stored document's version matches the one it was
+    rendered from, since other workers' updates do not invalidate this cache.
+    """
+
+    def __init__(self, db, stats_buffer, max_cached=10000, verify_cached=False):
+        self.db = db
+        self.reports = db.interview_reports
+        self.stats_buffer = stats_buffer
+        self.max_cached = max_cached
+        self.verify_cached = verify_cached
+        self._cache = OrderedDict()  # userId -> (etag, report, version of the document it came from)
+        self._stale = set()          # users whose materialized copy missed an update
+        # Change tokens: a report is only cached if nothing changed for its user while it was read
+        self._sequence = 0
+        self._changed = OrderedDict()  # userId -> sequence number of the user's last change
+        self._changed_floor = 0        # highest sequence number dropped from _changed
+        self._lock = threading.Lock()
+        stats_buffer.subscribe(on_record=self._on_stats_record, on_flush=self.apply_stat_deltas)
+
+    def get(self, user_id):
+        """Return (etag, report) for `user_id`, or (None, None) if the user does not exist."""
+        version = self.stored_version(user_id) if self.verify_cached else None
+        cached = self.cached(user_id, version)
+        if cached is not None:
+            return cached
+
+        # Read the materialized copy and the unflushed stats together so the report is exact
+        token = self.change_token(user_id)
+        with self.stats_buffer.hold_flushes():
+            doc = None if self.is_stale(user_id) else self.reports.find_one({'userId': user_id}, {'_id': 0})
+            if not is_current(doc):
+                doc = self._rebuild_locked(user_id)
+                if doc is None:
+                    return None, None
+            pending = self.pending(user_id)
+        return self.finish(user_id, doc, pending, token)
+
+    def cached(self, user_id, version=None):
+        """The cached (etag, report) for `user_id`, or None.
+
+        With verify_cached, `version` is the stored document's current version.
+        """
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is None or (self.verify_cached and cached[2] != version):
+                return None
+            self._cache.move_to_end(user_id)
+            return cached[:2]
+
+    def stored_version(self, user_id):
+        doc = self.reports.find_one({'userId': user_id}, {'_id': 0, 'version': 1})
+        return (doc or {}).get('version')
+
+    def change_token(self, user_id):
+        """Taken before reading a report; finish() only caches it if the user's token is unchanged."""
+        with self._lock:
+            return self._changed.get(user_id, self._changed_floor)
+
+    def is_stale(self, user_id):
+        return user_id in self._stale
+
+    def pending(self, user_id):
+        """Unflushed stats deltas for `user_id`, keyed by stats collection."""
+        return {
+            collection_name: self.stats_buffer.pending(collection_name, user_id)
+            for collection_name in REPORT_SECTIONS
+        }
+
+    def finish(self, user_id, doc, pending, token):
+        """Apply unflushed deltas to a materialized document, render it and cache the result.
+
+        `token` is change_token(user_id) from before the document was read.
+        """
+        for collection_name, increments in pending.items():
+            if increments:
+                prefix = REPORT_SECTIONS[collection_name]
+                apply_increments(doc, {prefix + field: delta for field, delta in increments.items()})
+
+        report = render_report(doc)
+        etag = report_etag(report)
+
+        # While the candidate is away the time-away figure keeps growing, so do not cache it
+        if not doc.get('tab', {}).get('hidden_since'):
+            with self._lock:
+                if self._changed.get(user_id, self._changed_floor) != token:
+                    return etag, report
+                self._cache[user_id] = (etag, report, doc.get('version'))
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+        return etag, report
+
+    def rebuild(self, user_id):
+        """Recompute the materialized report from the source collections."""
+        self.invalidate(user_id)
+        with self.stats_buffer.hold_flushes():
+            return self._rebuild_locked(user_id)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._cache.pop(user_id, None)
+            self._note_change_locked(user_id)
+
+    def apply_stat_deltas(self, flushed):
+        """Flush listener: mirror counter increments that just reached the stats collections."""
+        increments_by_user = {}
+        for (collection_name, user_id), increments in flushed.items():
+            prefix = REPORT_SECTIONS.get(collection_name)
+            if prefix is None:
+                continue
+            target = increments_by_user.setdefault(user_id, {'version': 1})
+            for field, delta in increments.items():
+                target[prefix + field] = target.get(prefix + field, 0) + delta
+
+        if not increments_by_user:
+            return
+        try:
+            self.reports.bulk_write([
+                UpdateOne({'userId': user_id}, {'$inc': increments}, upsert=True)
+                for user_id, increments in increments_by_user.items()
+            ], ordered=False)
+        except Exception as e:
+            print(f"Error updating materialized reports: {e}")
+            for user_id in increments_by_user:
+                self.mark_stale(user_id)
+            return
+        for user_id in increments_by_user:
+            self.invalidate(user_id)
+
+    def apply_tab_change(self, user_id, tab):
+        """Tab store listener: mirror the user's tab aggregates unless the report already holds a newer copy."""
+        try:
+            self.reports.update_one(*tab_mirror_update(user_id, tab), upsert=True)
+        except DuplicateKeyError:
+            pass  # the report exists with a newer tab version, so nothing matched and the upsert collided
+        except Exception as e:
+            print(f"Error updating materialized report: {e}")
+            self.mark_stale(user_id)
+        self.invalidate(user_id)
+
+    def mark_stale(self, user_id):
+        """Force the next read for `user_id` to rebuild from the source collections."""
+        with self._lock:
+            self._stale.add(user_id)
+            self._cache.pop(user_id, None)
+            self._note_change_locked(user_id)
+
+    def _on_stats_record(self, collection_name, user_id):
+        if collection_name in REPORT_SECTIONS:
+            self.invalidate(user_id)
+
+    def _note_change_locked(self, user_id):
+        self._sequence += 1
+        self._changed[user_id] = self._sequence
+        self._changed.move_to_end(user_id)
+        # Dropping the oldest entries raises the floor, so their users' older tokens no longer match
+        while len(self._changed) > self.max_cached:
+            _, sequence = self._changed.popitem(last=False)
+            self._changed_floor = max(self._changed_floor, sequence)
+
+    def _rebuild_locked(self, user_id):
+        # Get user information
+        user = self.db.users.find_one({'_id': ObjectId(user_id)}, USER_PROFILE_FIELDS)
+        if not user:
+            return None
+
+        facial_data = self.db.facial_expression_stats.find_one({'userId': user_id}, {'_id': 0, 'emotions': 1})
+        posture_data = self.db.posture_stats.find_one({'userId': user_id}, POSTURE_COUNT_FIELDS)
+        eye_data = self.db.eye_stats.find_one({'userId': user_id}, EYE_COUNT_FIELDS)
+        tab_data = self.db.tab_activity.find_one({'userId': user_id}, TAB_MIRROR_FIELDS)
+
+        doc = self.reports.find_one_and_update(
+            {'userId': user_id},
+            {
+                '$set': {
+                    'schema': REPORT_SCHEMA_VERSION,
+                    'user': {
+                        'name': user.get('name', 'Unknown'),
+                        'email': user.get('email', 'Unknown')
+                    },
+                    'has_emotions': facial_data is not None,
+                    'emotions': (facial_data or {}).get('emotions', {}),
+                    'has_posture': posture_data is not None,
+                    'posture': posture_data or {},
+                    'has_eyes': eye_data is not None,
+                    'eyes': eye_data or {},
+                    'tab': tab_data or {},
+                    'rebuilt_at': int(time.time() * 1000)
+                },
+                '$inc': {'version': 1}
+            },
+            projection={'_id': 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+        # A tab change mirrored between the read above and this write was overwritten by the older copy
+        latest = self.db.tab_activity.find_one({'userId': user_id}, TAB_MIRROR_FIELDS)
+        if latest is not None and latest.get('version') != (tab_data or {}).get('version'):
+            self.reports.update_one(*tab_mirror_update(user_id, latest))
+            doc = self.reports.find_one({'userId': user_id}, {'_id': 0})
+
+        with self._lock:
+            self._stale.discard(user_id)
+        return doc
+
+
+def tab_mirror_update(user_id, tab):
+    """(filter, update) copying tab aggregates into a report unless it already holds the same or a newer version.
+
+    Whole copies rather than increments, so a mirror that races a rebuild can simply be applied again.
+    """
+    version = tab.get('version', 0)
+    return (
+        {'userId': user_id, '$or': [{'tab.version': {'$lt': version}}, {'tab.version': {'$exists': False}}]},
+        {'$set': {'tab': tab}, '$inc': {'version': 1}}
+    )
+
+
+def is_current(doc):
+    """A materialized copy is usable once it has been built by this schema version."""
+    return bool(doc) and doc.get('schema') == REPORT_SCHEMA_VERSION and 'user' in doc
+
+
+def render_report(doc, now_ms=None):
+    """Report payload in the shape returned by /api/generate-interview-report."""
+    report = {
+        'user': doc['user'],
+        'facial_expressions': {},
+        'posture': {},
+        'eye_activity': {},
+        'tab_activity': {},
+        'interviews': []
+    }
+
+    emotions = doc.get('emotions') or {}
+    if doc.get('has_emotions') or emotions:
+        report['facial_expressions'] = emotion_summary(emotions)
+    else:
+        report['facial_expressions'] = {'message': 'No facial expression data available'}
+
+    posture = doc.get('posture') or {}
+    if doc.get('has_posture') or posture.get('total_frames'):
+        report['posture'] = posture_summary(posture)
+
+    eyes = doc.get('eyes') or {}
+    if doc.get('has_eyes') or eyes.get('total_frames'):
+        report['eye_activity'] = eye_summary(eyes)
+
+    metrics = tab_metrics(doc.get('tab'), now_ms)
+    report['tab_activity'] = {
+        'switch_count': metrics['switch_count'],
+        'time_away_seconds': metrics['time_away_seconds'],
+        'time_away_formatted': metrics['time_away_formatted']
+    }
+    return report
+
+
+def report_etag(report):
+    """Content-based ETag, so every worker produces the same tag for the same report."""
+    return hashlib.sha1(json.dumps(report, sort_keys=True).encode('utf-8')).hexdigest()
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class _Entry:
+    def __init__(self, value):
+        self.value = value
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.users = 0
+        self.evicted = False
+
+
+class SessionPool:
+    """Session-affine cache of per-candidate objects with LRU/TTL eviction and a cap on resident entries."""
+
+    def __init__(self, factory, max_size=64, ttl_seconds=300, on_evict=None):
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl_seconds)
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> _Entry, least recently used first
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, key):
+        """Yield the object for `key`, holding it exclusively for the duration of the block."""
+        entry = self._acquire(key)
+        try:
+            with entry.lock:
+                yield entry.value
+        finally:
+            self._release(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def discard(self, key):
+        """Drop the entry for `key` (e.g. when an interview ends)."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            to_close = self._mark_evicted(entry)
+        self._close(to_close)
+
+    def clear(self):
+        with self._lock:
+            to_close = []
+            for entry in self._entries.values():
+                to_close.extend(self._mark_evicted(entry))
+            self._entries.clear()
+        self._close(to_close)
+
+    def _acquire(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.users += 1
+                return entry
+
+        # Build outside the pool lock so a slow factory does not block other sessions
+        new_entry = _Entry(self.factory())
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = new_entry
+                new_entry = None
+                self._entries[key] = entry
+            else:
+                self._entries.move_to_end(key)
+            entry.users += 1
+            to_close = self._evict_locked()
+
+        if new_entry is not None:
+            # Another thread created this session first
+            to_close.append(new_entry.value)
+        self._close(to_close)
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            to_close = [entry.value] if entry.evicted and entry.users == 0 else []
+        self._close(to_close)
+
+    def _evict_locked(self):
+        to_close = []
+        now = time.monotonic()
+
+        # Expire idle sessions first
+        for key, entry in list(self._entries.items()):
+            if entry.users == 0 and now - entry.last_used > self.ttl:
+                del self._entries[key]
+                to_close.extend(self._mark_evicted(entry))
+
+        # Then drop least recently used idle sessions until we are under the cap
+        if len(self._entries) > self.max_size:
+            for key, entry in list(self._entries.items()):
+                if len(self._entries) <= self.max_size:
+                    break
+                if entry.users == 0:
+                    del self._entries[key]
+                    to_close.extend(self._mark_evicted(entry))
+        return to_close
+
+    def _mark_evicted(self, entry):
+        if entry is None:
+            return []
+        entry.evicted = True
+        # Entries still in use are closed by _release once their last user is done
+        return [entry.value] if entry.users == 0 else []
+
+    def _close(self, values):
+        if self.on_evict is None:
+            return
+        for value in values:
+            try:
+                self.on_evict(value)
+            except Exception as e:
+                print(f"Error closing pooled session: {e}")
@@ -0,0 +1,98 @@
+"""Counter updates and derived figures for the per-user emotion and posture stats.
+
+Only counters are stored; percentages are derived whenever the stats are read.
+"""
+
+POSTURE_COUNT_FIELDS = {'_id': 0, 'good_posture_count': 1, 'bad_posture_count': 1, 'total_frames': 1}
+EYE_COUNT_FIELDS = {'_id': 0, 'active_count': 1, 'sleeping_count': 1, 'no_face_count': 1, 'total_frames': 1,
+                    'blink_count': 1, 'observed_seconds': 1}
+
+
+def is_valid_emotion(emotion):
+    """Emotion names become field names under `emotions`, so reject ones Mongo would interpret."""
+    return isinstance(emotion, str) and bool(emotion) and '.' not in emotion and not emotion.startswith('$')
+
+
+def emotion_increment(emotion, count=1):
+    """$inc document that adds `count` to one emotion."""
+    return {f'emotions.{emotion}': count}
+
+
+def posture_increment(label, count=1):
+    """$inc document that adds `count` frames with the given posture label."""
+    good = count if label == "Good Posture" else 0
+    return {
+        'good_posture_count': good,
+        'bad_posture_count': count - good,
+        'total_frames': count
+    }
+
+
+def eye_increment(status, blinks=0, observed_seconds=0.0):
+    """$inc document for one analyzed frame with the given eye status ('Active', 'Sleeping' or 'No Face')."""
+    return {
+        'active_count': int(status == 'Active'),
+        'sleeping_count': int(status == 'Sleeping'),
+        'no_face_count': int(status == 'No Face'),
+        'total_frames': 1,
+        'blink_count': blinks,
+        'observed_seconds': observed_seconds
+    }
+
+
+def posture_summary(stats):
+    """Counts plus derived percentages from a posture stats document (or None)."""
+    stats = stats or {}
+    good = stats.get('good_posture_count', 0)
+    bad = stats.get('bad_posture_count', 0)
+    total = stats.get('total_frames', 0)
+    return {
+        'good_count': good,
+        'bad_count': bad,
+        'total_frames': total,
+        'good_percentage': round(good / total * 100, 2) if total else 0,
+        'bad_percentage': round(bad / total * 100, 2) if total else 0
+    }
+
+
+def emotion_summary(emotions):
+    """Emotion counts plus the dominant emotion and percentages, as shown in the report."""
+    # Try to ensure facial expressions data is in a dictionary format
+    if not isinstance(emotions, dict):
+        emotions = {}
+    counts = {emotion: count for emotion, count in emotions.items() if isinstance(count, int)}
+
+    summary = dict(counts)
+    if counts:
+        dominant_emotion = max(counts.items(), key=lambda x: x[1])
+        summary['dominant'] = {
+            'emotion': dominant_emotion[0],
+            'count': dominant_emotion[1]
+        }
+
+        total_emotions = sum(counts.values())
+        summary['percentages'] = {
+            emotion: round((count / total_emotions) * 100, 2) for emotion, count in counts.items()
+        } if total_emotions > 0 else {}
+    return summary
+
+
+def eye_summary(stats):
+    """Alertness figures from an eye stats document (or None); percentages are of frames with a face."""
+    stats = stats or {}
+    active = stats.get('active_count', 0)
+    sleeping = stats.get('sleeping_count', 0)
+    with_face = active + sleeping
+    observed = stats.get('observed_seconds', 0)
+    blinks = stats.get('blink_count', 0)
+    return {
+        'active_count': active,
+        'sleeping_count': sleeping,
+        'no_face_count': stats.get('no_face_count', 0),
+        'total_frames': stats.get('total_frames', 0),
+        'active_percentage': round(active / with_face * 100, 2) if with_face else 0,
+        'sleeping_percentage': round(sleeping / with_face * 100, 2) if with_face else 0,
+        'blink_count': blinks,
+        # Only continuously sampled stretches count, so sparse polling does not dilute the rate
+        'blinks_per_minute': round(blinks / observed * 60, 2) if observed >= 10 else None
+    }
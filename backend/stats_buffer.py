@@ -0,0 +1,232 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class StatsWriteBehind:
+    """Accumulates per-user counter deltas in memory and flushes them to MongoDB in bulk.
+
+    Deltas are flushed every `flush_interval_ms`, as soon as `max_pending_users`
+    users have unflushed deltas, and on shutdown. With `flush_interval_ms=0`
+    every record is written straight through.
+
+    Running totals are cached per user. When several worker processes share
+    the collections, set `max_totals_age_seconds` so each worker re-reads the
+    stored counts (which include the other workers' flushes) that often.
+    """
+
+    def __init__(self, db, flush_interval_ms=1000, max_pending_users=500, max_cached_totals=10000,
+                 max_totals_age_seconds=None):
+        self.db = db
+        self.flush_interval = max(0.0, float(flush_interval_ms) / 1000.0)
+        self.max_pending_users = max(1, int(max_pending_users))
+        self.max_cached_totals = max_cached_totals
+        self.max_totals_age = max_totals_age_seconds or None
+        self._deltas = {}     # (collection name, userId) -> {field: delta}
+        self._inflight = {}   # deltas taken by a flush that has not finished yet
+        self._totals = OrderedDict()  # running totals for callers that need them per frame
+        self._totals_loaded_at = {}   # key -> monotonic time the totals were read from MongoDB
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self._record_listeners = []
+        self._flush_listeners = []
+        self._generation = 0  # odd while a flush is in progress
+
+    def subscribe(self, on_record=None, on_flush=None):
+        """Register on_record(collection_name, user_id) and/or on_flush({(collection_name, user_id): increments}).
+
+        Flush listeners run after the bulk write succeeds, while flushes are still held.
+        """
+        if on_record is not None:
+            self._record_listeners.append(on_record)
+        if on_flush is not None:
+            self._flush_listeners.append(on_flush)
+
+    def hold_flushes(self):
+        """Context manager that keeps flushes from landing while the caller reads stored and pending counts."""
+        return self._flush_lock
+
+    def flush_generation(self):
+        """Counter that is odd while a flush is running; readers that cannot hold flushes
+        (e.g. async handlers) compare it before and after their read and retry on change."""
+        return self._generation
+
+    def record(self, collection_name, user_id, increments, load_totals=None):
+        """Add counter increments for one user.
+
+        If `load_totals` is given (a function returning the stored document), the
+        user's up-to-date totals, including unflushed deltas, are returned.
+        """
+        key = (collection_name, user_id)
+        totals = None
+        if load_totals is not None and (key not in self._totals or self._totals_expired(key)):
+            self._seed_totals(key, load_totals)
+
+        with self._lock:
+            _merge(self._deltas.setdefault(key, {}), increments)
+            if key in self._totals:
+                _merge(self._totals[key], increments)
+                self._totals.move_to_end(key)
+                totals = dict(self._totals[key])
+            pending_users = len(self._deltas)
+
+        for listener in self._record_listeners:
+            listener(collection_name, user_id)
+
+        if self.flush_interval == 0 or self._closed:
+            self.flush()
+        else:
+            self._ensure_worker()
+            if pending_users >= self.max_pending_users:
+                self._wake.set()
+        return totals
+
+    def pending(self, collection_name, user_id):
+        """Deltas for one user that are not yet visible in MongoDB."""
+        key = (collection_name, user_id)
+        with self._lock:
+            combined = {}
+            _merge(combined, self._inflight.get(key, {}))
+            _merge(combined, self._deltas.get(key, {}))
+            return combined
+
+    def flush(self):
+        """Write every pending delta with one unordered bulk write per collection."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._deltas:
+                    return 0
+                self._generation += 1
+                self._inflight, self._deltas = self._deltas, {}
+                batch = self._inflight
+            try:
+                return self._write_batch(batch)
+            finally:
+                self._generation += 1
+
+    def _write_batch(self, batch):
+        # Runs with the flush lock held
+        operations = {}  # collection name -> ([keys], [UpdateOne]) in the same order
+        for (collection_name, user_id), increments in batch.items():
+            keys, ops = operations.setdefault(collection_name, ([], []))
+            keys.append((collection_name, user_id))
+            ops.append(UpdateOne({'userId': user_id}, {'$inc': increments}, upsert=True))
+
+        # Deltas are re-queued only when their write is known to have failed. A bulk write error
+        # names the failed operations (the others were applied); any other error (e.g. a dropped
+        # connection) leaves it unknown, so the whole collection is retried and its counters may
+        # be applied twice (at-least-once).
+        failed = set()
+        try:
+            for collection_name, (keys, ops) in operations.items():
+                try:
+                    self.db[collection_name].bulk_write(ops, ordered=False)
+                except BulkWriteError as e:
+                    write_errors = e.details.get('writeErrors', [])
+                    print(f"Error flushing stats to {collection_name}: {len(write_errors)} of {len(ops)} updates failed")
+                    failed.update(keys[error['index']] for error in write_errors)
+                except Exception as e:
+                    print(f"Error flushing stats to {collection_name}: {e}")
+                    failed.update(keys)
+        finally:
+            with self._lock:
+                # Put back whatever was not written so the next flush retries it
+                for key in failed:
+                    _merge(self._deltas.setdefault(key, {}), batch[key])
+                self._inflight = {}
+
+        flushed = {key: increments for key, increments in batch.items() if key not in failed}
+        for listener in self._flush_listeners if flushed else []:
+            try:
+                listener(flushed)
+            except Exception as e:
+                print(f"Error in stats flush listener: {e}")
+        return len(flushed)
+
+    def close(self):
+        """Flush everything that is still pending (called on shutdown)."""
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def _seed_totals(self, key, load_totals):
+        with self._flush_lock:
+            doc = load_totals() or {}
+            with self._lock:
+                totals = {k: v for k, v in doc.items() if isinstance(v, (int, float))}
+                _merge(totals, self._inflight.get(key, {}))
+                _merge(totals, self._deltas.get(key, {}))
+                self._totals[key] = totals
+                self._totals.move_to_end(key)
+                self._totals_loaded_at[key] = time.monotonic()
+                while len(self._totals) > self.max_cached_totals:
+                    evicted, _ = self._totals.popitem(last=False)
+                    self._totals_loaded_at.pop(evicted, None)
+
+    def _totals_expired(self, key):
+        if self.max_totals_age is None:
+            return False
+        return time.monotonic() - self._totals_loaded_at.get(key, 0) > self.max_totals_age
+
+    def _ensure_worker(self):
+        # Started lazily (and again in forked children) since threads do not survive a fork
+        pid = os.getpid()
+        if self._worker_pid == pid and self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker_pid != pid or self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="stats-flusher", daemon=True)
+                self._worker_pid = pid
+                self._worker.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def apply_increments(doc, increments):
+    """Apply a {dotted.field: delta} increment map to a plain document."""
+    for path, delta in increments.items():
+        target = doc
+        parts = path.split('.')
+        for part in parts[:-1]:
+            child = target.get(part)
+            if not isinstance(child, dict):
+                child = {}
+            else:
+                child = dict(child)
+            target[part] = child
+            target = child
+        target[parts[-1]] = target.get(parts[-1], 0) + delta
+    return doc
+
+
+def _merge(target, increments):
+    for field, delta in increments.items():
+        target[field] = target.get(field, 0) + delta
+    return target
+
+
+def create_stats_buffer(db):
+    """Build the process-wide buffer from environment settings and flush it at exit."""
+    buffer = StatsWriteBehind(
+        db,
+        flush_interval_ms=float(os.getenv('STATS_FLUSH_INTERVAL_MS', 1000)),
+        max_pending_users=int(os.getenv('STATS_FLUSH_MAX_USERS', 500)),
+        # With several workers, other processes' counts show up once flushed and re-read
+        max_totals_age_seconds=float(os.getenv('STATS_TOTALS_MAX_AGE_SECONDS',
+                                               5 if int(os.getenv('SERVER_WORKERS', 1)) > 1 else 0))
+    )
+    atexit.register(buffer.close)
+    return buffer
@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+
+from admission import AnalysisOverloadedError
+from frame_io import decode_data_url, decode_frame
+from metrics import stage
+import tracing
+
+
+class StreamSession:
+    """One live interview connection: frames and tab events in, analysis results pushed out as they finish."""
+
+    def __init__(self, ws, user_id, analyzers, record_tab_activity, executor, admission=None):
+        self.ws = ws
+        self.user_id = user_id
+        self.analyzers = analyzers  # name -> fn(frame, user_id) returning a JSON-serialisable dict
+        self.enabled = list(analyzers)
+        self.record_tab_activity = record_tab_activity
+        self.executor = executor
+        self.admission = admission  # optional AdmissionController shared with the HTTP analysis endpoints
+        self.closed = False
+        self._frame_count = 0
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._busy = set()   # analyzers with a frame in flight
+        self._pending = {}   # analyzer -> newest (frame_id, frame) waiting behind it
+
+    def send(self, message):
+        # Results arrive from worker threads, so writes to the socket are serialised
+        with self._send_lock:
+            if self.closed:
+                return
+            try:
+                self.ws.send(json.dumps(message))
+            except Exception:
+                self.closed = True
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._pending.clear()
+
+    def handle(self, message):
+        """Dispatch one incoming message (binary frame or JSON text)."""
+        if isinstance(message, (bytes, bytearray)):
+            self._frame_count += 1
+            with stage('stream', 'imdecode'):
+                frame = decode_frame(message)
+            self.submit_frame(self._frame_count, frame, self.enabled)
+            return
+
+        try:
+            data = json.loads(message)
+        except ValueError:
+            self.send({'type': 'error', 'error': 'Messages must be JSON or binary image frames'})
+            return
+
+        kind = data.get('type')
+        if kind == 'frame':
+            self._frame_count += 1
+            frame_id = data.get('id', self._frame_count)
+            names = data.get('analyzers') or self.enabled
+            with stage('stream', 'read_body'):
+                buffer = decode_data_url(data.get('image'))
+            with stage('stream', 'imdecode'):
+                frame = decode_frame(buffer)
+            self.submit_frame(frame_id, frame, names)
+        elif kind == 'config':
+            names = [name for name in data.get('analyzers', []) if name in self.analyzers]
+            self.enabled = names or list(self.analyzers)
+            self.send({'type': 'config', 'analyzers': self.enabled})
+        elif kind == 'tab':
+            self.handle_tab(data)
+        elif kind == 'ping':
+            self.send({'type': 'pong', 'timestamp': int(time.time() * 1000)})
+        else:
+            self.send({'type': 'error', 'error': f'Unknown message type: {kind}'})
+
+    def handle_tab(self, data):
+        status = data.get('status')  # 'hidden' or 'visible'
+        timestamp = data.get('timestamp') or int(time.time() * 1000)  # Client timestamp or server time
+        if status not in ['hidden', 'visible']:
+            self.send({'type': 'error', 'error': 'status must be either "hidden" or "visible"'})
+            return
+        try:
+            activity = self.record_tab_activity(self.user_id, status, timestamp)
+            self.send({'type': 'tab', 'activity': activity})
+        except Exception as e:
+            print(f"Error tracking tab activity: {e}")
+            self.send({'type': 'error', 'error': str(e)})
+
+    def submit_frame(self, frame_id, frame, names):
+        if frame is None:
+            self.send({'type': 'error', 'id': frame_id, 'error': 'Failed to decode image'})
+            return
+
+        for name in names:
+            if name not in self.analyzers:
+                self.send({'type': 'error', 'id': frame_id, 'error': f'Unknown analyzer: {name}'})
+                continue
+            with self._lock:
+                if name in self._busy:
+                    # Only the newest frame waits behind the one in flight; older ones are dropped
+                    self._pending[name] = (frame_id, frame)
+                    continue
+                self._busy.add(name)
+            self.executor.submit(self._run, name, frame_id, frame)
+
+    def analyze(self, name, frame):
+        if self.admission is None:
+            return self.analyzers[name](frame, self.user_id)
+        with self.admission.admit((name, self.user_id)):
+            return self.analyzers[name](frame, self.user_id)
+
+    def _run(self, name, frame_id, frame):
+        while True:
+            try:
+                with tracing.tracer.trace(f'stream_{name}'):
+                    result = self.analyze(name, frame)
+                self.send({'type': name, 'id': frame_id, 'result': result})
+            except AnalysisOverloadedError as e:
+                self.send({'type': 'busy', 'analyzer': name, 'id': frame_id, 'reason': e.reason,
+                           'retryAfter': e.retry_after})
+            except Exception as e:
+                print(f"Error in streamed {name} analysis: {e}")
+                self.send({'type': 'error', 'analyzer': name, 'id': frame_id, 'error': str(e)})
+
+            with self._lock:
+                next_frame = self._pending.pop(name, None)
+                if next_frame is None or self.closed:
+                    self._busy.discard(name)
+                    return
+            frame_id, frame = next_frame
+
+
+def register_stream_route(sock, analyzers, record_tab_activity, path='/api/stream', max_workers=None, admission=None):
+    """Add the per-interview WebSocket endpoint to a flask_sock.Sock instance."""
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stream')
+
+    @sock.route(path)
+    def stream(ws):
+        user_id = request.args.get('userId') or 'guest_user'
+        session = StreamSession(ws, user_id, analyzers, record_tab_activity, executor, admission)
+        session.send({'type': 'ready', 'userId': user_id, 'analyzers': session.enabled})
+        try:
+            while True:
+                message = ws.receive()
+                if message is None:
+                    break
+                session.handle(message)
+        finally:
+            session.close()
+
+    return stream
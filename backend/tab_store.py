@@ -0,0 +1,173 @@
+import time
+from datetime import datetime
+
+import pymongo
+
+# Only the running aggregates are needed to serve metrics
+TAB_METRIC_FIELDS = {'_id': 0, 'switch_count': 1, 'time_away_ms': 1, 'hidden_since': 1}
+# What the interview report mirrors: the aggregates plus the version bumped by every change
+TAB_MIRROR_FIELDS = {**TAB_METRIC_FIELDS, 'version': 1}
+
+
+class TabActivityStore:
+    """Tab visibility events persisted in MongoDB, with running aggregates updated in O(1) per event.
+
+    Each user has one document holding the switch count, the start of the
+    currently open hidden interval, the total time away, and the most recent
+    `max_events` raw events.
+    """
+
+    def __init__(self, collection, max_events=200, listener=None):
+        self.collection = collection
+        self.max_events = max_events
+        # listener(user_id, tab) receives the user's aggregates (TAB_MIRROR_FIELDS) after each change
+        self.listener = listener
+
+    def record(self, user_id, status, timestamp):
+        """Store a 'hidden' or 'visible' event for `user_id` and return the stored entry."""
+        activity = make_activity(status, timestamp)
+        update = hidden_update(activity, self.max_events) if status == 'hidden' \
+            else visible_update(activity, self.max_events)
+
+        if status == 'hidden':
+            tab = self.collection.find_one_and_update(
+                {'userId': user_id}, update,
+                projection=TAB_MIRROR_FIELDS,
+                upsert=True,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            self._notify(user_id, tab)
+            return activity
+
+        # Close the open hidden interval; only one visible event can claim it
+        before = self.collection.find_one_and_update(
+            {'userId': user_id}, update,
+            projection={'_id': 0, 'hidden_since': 1},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.BEFORE
+        )
+        away_ms = closed_interval_ms(before, timestamp)
+        tab = self.collection.find_one_and_update(
+            {'userId': user_id}, closed_interval_update(away_ms),
+            projection=TAB_MIRROR_FIELDS,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        self._notify(user_id, tab)
+        return activity
+
+    def _notify(self, user_id, update):
+        if self.listener is not None:
+            self.listener(user_id, update)
+
+    def activity(self, user_id, now_ms=None):
+        """Retained raw events plus metrics for `user_id`."""
+        doc = self.collection.find_one({'userId': user_id}, {**TAB_METRIC_FIELDS, 'events': 1})
+        return (doc or {}).get('events', []), tab_metrics(doc, now_ms)
+
+
+def make_activity(status, timestamp):
+    # Create activity entry with formatted time
+    return {
+        'status': status,
+        'timestamp': timestamp,
+        'formatted_time': datetime.fromtimestamp(timestamp / 1000).strftime('%H:%M:%S')
+    }
+
+
+def hidden_update(activity, max_events):
+    """A hidden event counts as a switch and opens (or restarts) the hidden interval."""
+    return {
+        '$inc': {'switch_count': 1, 'version': 1},
+        '$set': {'hidden_since': activity['timestamp']},
+        '$push': {'events': {'$each': [activity], '$slice': -max_events}}
+    }
+
+
+def visible_update(activity, max_events):
+    """A visible event closes the hidden interval; the caller adds its length from the previous value."""
+    return {
+        '$inc': {'version': 1},
+        '$set': {'hidden_since': None},
+        '$push': {'events': {'$each': [activity], '$slice': -max_events}}
+    }
+
+
+def closed_interval_update(away_ms):
+    """Adds a closed hidden interval to the time away (a new version even if it is 0, so the report is re-mirrored)."""
+    return {'$inc': {'time_away_ms': away_ms, 'version': 1}}
+
+
+def closed_interval_ms(before, timestamp):
+    hidden_since = (before or {}).get('hidden_since')
+    if hidden_since is None:
+        return 0
+    return max(0, timestamp - hidden_since)
+
+
+def tab_metrics(doc, now_ms=None):
+    """Metrics from a tab activity document, counting an open hidden interval up to now."""
+    doc = doc or {}
+    time_away = doc.get('time_away_ms', 0) / 1000  # Convert to seconds
+
+    # If the last status was 'hidden', count time until now
+    hidden_since = doc.get('hidden_since')
+    if hidden_since is not None:
+        now_ms = now_ms if now_ms is not None else time.time() * 1000
+        time_away += max(0, now_ms - hidden_since) / 1000
+
+    minutes = int(time_away // 60)
+    seconds = int(time_away % 60)
+    return {
+        'switch_count': doc.get('switch_count', 0),
+        'time_away_seconds': round(time_away, 2),
+        'time_away_formatted': f"{minutes}m {seconds}s",
+        'hidden': hidden_since is not None
+    }
+
+
+class AsyncTabActivityStore:
+    """Same storage layout as TabActivityStore, for the async serving mode (Motor-style collection).
+
+    `listener` is an async callable receiving the same aggregate documents.
+    """
+
+    def __init__(self, collection, max_events=200, listener=None):
+        self.collection = collection
+        self.max_events = max_events
+        self.listener = listener
+
+    async def record(self, user_id, status, timestamp):
+        activity = make_activity(status, timestamp)
+
+        if status == 'hidden':
+            tab = await self.collection.find_one_and_update(
+                {'userId': user_id}, hidden_update(activity, self.max_events),
+                projection=TAB_MIRROR_FIELDS,
+                upsert=True,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            await self._notify(user_id, tab)
+            return activity
+
+        before = await self.collection.find_one_and_update(
+            {'userId': user_id}, visible_update(activity, self.max_events),
+            projection={'_id': 0, 'hidden_since': 1},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.BEFORE
+        )
+        away_ms = closed_interval_ms(before, timestamp)
+        tab = await self.collection.find_one_and_update(
+            {'userId': user_id}, closed_interval_update(away_ms),
+            projection=TAB_MIRROR_FIELDS,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        await self._notify(user_id, tab)
+        return activity
+
+    async def _notify(self, user_id, update):
+        if self.listener is not None:
+            await self.listener(user_id, update)
+
+    async def activity(self, user_id, now_ms=None):
+        doc = await self.collection.find_one({'userId': user_id}, {**TAB_METRIC_FIELDS, 'events': 1})
+        return (doc or {}).get('events', []), tab_metrics(doc, now_ms)
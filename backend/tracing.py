@@ -0,0 +1,231 @@
+import contextvars
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Span timings collected while one request (or streamed frame) is handled."""
+
+    __slots__ = ('trace_id', 'handler', 'endpoint', 'started_at', 'perf_start', 'status', 'spans')
+
+    def __init__(self, handler, endpoint=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.handler = handler
+        self.endpoint = endpoint or handler
+        self.started_at = time.time()
+        self.perf_start = time.perf_counter()
+        self.status = None
+        self.spans = []
+
+    def add_span(self, name, start, duration, error=False):
+        # list.append is atomic, so analyzers running on other threads can add spans too
+        span = {
+            'name': name,
+            'offset_ms': round((start - self.perf_start) * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+            'thread': threading.current_thread().name
+        }
+        if error:
+            span['error'] = True
+        self.spans.append(span)
+
+    def to_dict(self, duration):
+        return {
+            'trace_id': self.trace_id,
+            'handler': self.handler,
+            'endpoint': self.endpoint,
+            'status': self.status,
+            'pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='milliseconds'),
+            'duration_ms': round(duration * 1000, 3),
+            'spans': sorted(self.spans, key=lambda span: span['offset_ms'])
+        }
+
+
+class Tracer:
+    """Writes per-request span timings as JSON lines for a sample of requests.
+
+    Spans are always collected (a few list appends per frame); a trace is
+    written when it is sampled (`sample_rate`, 0..1) or took longer than
+    `slow_ms`. Files go to `output_dir/traces-<date>-<pid>.jsonl`.
+    """
+
+    def __init__(self, output_dir='traces', sample_rate=0.0, slow_ms=None):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+
+    def configure(self, sample_rate=None, slow_ms=None, output_dir=None):
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        if slow_ms is not None:
+            self.slow_ms = float(slow_ms) if float(slow_ms) > 0 else None
+        if output_dir is not None:
+            self.output_dir = output_dir
+
+    def settings(self):
+        return {'sample_rate': self.sample_rate, 'slow_ms': self.slow_ms, 'output_dir': self.output_dir}
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.slow_ms is not None
+
+    @contextmanager
+    def trace(self, handler, endpoint=None):
+        """Collect spans for the enclosed work; yields the Trace (or None when tracing is off)."""
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace(handler, endpoint)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            self.finish(trace)
+
+    def finish(self, trace):
+        duration = time.perf_counter() - trace.perf_start
+        slow = self.slow_ms is not None and duration * 1000 >= self.slow_ms
+        if not slow and random.random() >= self.sample_rate:
+            return
+        try:
+            self._write(trace.to_dict(duration))
+        except Exception as e:
+            print(f"Error writing trace: {e}")
+
+    def _write(self, record):
+        path = os.path.join(self.output_dir, f"traces-{datetime.now():%Y%m%d}-{os.getpid()}.jsonl")
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class Profiler:
+    """Runs cProfile for the next N requests of selected endpoints and dumps one .prof file per request.
+
+    Only one request is profiled at a time; requests arriving while another
+    is being profiled run normally and do not use up the budget.
+    """
+
+    def __init__(self, output_dir='traces'):
+        self.output_dir = output_dir
+        self._armed = {}  # endpoint -> remaining requests
+        self._busy = False
+        self._recent = []
+        self._lock = threading.Lock()
+
+    def arm(self, endpoint, count):
+        with self._lock:
+            self._armed[endpoint] = self._armed.get(endpoint, 0) + max(1, int(count))
+            return self._armed[endpoint]
+
+    def disarm(self, endpoint=None):
+        with self._lock:
+            if endpoint is None:
+                self._armed.clear()
+            else:
+                self._armed.pop(endpoint, None)
+
+    def status(self):
+        with self._lock:
+            return {'armed': dict(self._armed), 'profiling': self._busy, 'recent_profiles': list(self._recent)}
+
+    @contextmanager
+    def profile(self, endpoint):
+        """Profile the enclosed work if `endpoint` has budget left, otherwise just run it."""
+        if endpoint not in self._armed or not self._claim(endpoint):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # another profiler (e.g. a debugger) is already active
+            print(f"Could not start profiler: {e}")
+            self._release(endpoint, used=False)
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._dump(endpoint, profiler)
+            self._release(endpoint, used=True)
+
+    def _claim(self, endpoint):
+        with self._lock:
+            if self._busy or self._armed.get(endpoint, 0) <= 0:
+                return False
+            self._busy = True
+            return True
+
+    def _release(self, endpoint, used):
+        with self._lock:
+            self._busy = False
+            if used and endpoint in self._armed:
+                self._armed[endpoint] -= 1
+                if self._armed[endpoint] <= 0:
+                    del self._armed[endpoint]
+
+    def _dump(self, endpoint, profiler):
+        path = os.path.join(self.output_dir, 'profiles',
+                            f"{endpoint}-{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}.prof")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            profiler.dump_stats(path)
+        except Exception as e:
+            print(f"Error writing profile: {e}")
+            return
+        with self._lock:
+            self._recent = (self._recent + [path])[-20:]
+
+
+tracer = Tracer()
+profiler = Profiler()
+
+
+def configure_from_env():
+    """Apply TRACE_DIR, TRACE_SAMPLE_RATE and TRACE_SLOW_MS to the shared tracer and profiler."""
+    output_dir = os.getenv('TRACE_DIR', 'traces')
+    tracer.configure(sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', 0)),
+                     slow_ms=float(os.getenv('TRACE_SLOW_MS', 0)),
+                     output_dir=output_dir)
+    profiler.output_dir = output_dir
+
+
+def add_span(name, start, duration, error=False):
+    """Record a finished span on the trace of the current request, if there is one."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, duration, error)
+
+
+@contextmanager
+def request_trace(handler, endpoint, profile=True):
+    """Trace one request and profile it when an operator has armed its endpoint."""
+    with tracer.trace(handler, endpoint) as trace:
+        if profile:
+            with profiler.profile(endpoint):
+                yield trace
+        else:
+            yield trace
+
+
+def run_in_context(executor, fn, *args):
+    """executor.submit() that carries the current trace into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
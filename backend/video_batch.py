@@ -0,0 +1,255 @@
+"""Offline analysis of recorded interview videos with the same analyzers, stats and report as the live API.
+
+Each video is decoded on its own thread and sampled at --fps. Every analyzer
+gets an ordered lane per video, because the pose, face and eye trackers need
+the frames in sequence. Several candidates are processed at once (--workers),
+and their posture frames are batched into shared model calls. Counters go to
+the stats collections and the materialized report, as live frames do.
+
+    python video_batch.py interview.mp4 --user-id 65f0c2...      # one candidate
+    python video_batch.py recordings/*.mp4 --output reports/     # userId from each file name
+
+Set MONGO_URI (and MONGO_DB_NAME) to the database the live server uses.
+Videos of the same candidate are analyzed one after another, in the order given.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from bson.objectid import ObjectId
+
+from eye_analyzer import EyeSession
+
+# Models each analyzer needs from app.model_registry
+ANALYZER_MODELS = {'emotion': ['emotion'], 'posture': ['pose', 'posture'], 'eyes': ['eyes']}
+
+
+class VideoFrameReader(threading.Thread):
+    """Decodes a video on a dedicated thread and queues (seconds, frame) samples at `sample_fps`.
+
+    Frames between samples are grabbed but not decoded into images. The queue
+    is bounded, so decoding stays only a few frames ahead of the analyzers.
+    """
+
+    def __init__(self, path, sample_fps=2.0, max_queued=32):
+        super().__init__(name=f'decode-{os.path.basename(path)}', daemon=True)
+        self.path = path
+        self.sample_fps = sample_fps
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.fps = None
+        self.frames_read = 0
+        self.error = None
+
+    def run(self):
+        capture = cv2.VideoCapture(self.path)
+        try:
+            if not capture.isOpened():
+                raise IOError(f'Cannot open video: {self.path}')
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            self.fps = fps if fps and fps > 0 else 30.0
+            step = self.fps / self.sample_fps if self.sample_fps and self.sample_fps < self.fps else 1.0
+
+            next_sample = 0.0
+            while True:
+                if self.frames_read >= next_sample:
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    self.queue.put((self.frames_read / self.fps, frame))
+                    next_sample += step
+                elif not capture.grab():
+                    break
+                self.frames_read += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            capture.release()
+            self.queue.put(None)
+
+    def frames(self):
+        """Yield (seconds, frame) until the video ends; re-raises a decoding error at the end."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            yield item
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def duration(self):
+        return self.frames_read / self.fps if self.fps else 0.0
+
+
+class VideoBatch:
+    """Runs recorded videos through app.py's analyzers, grouped by candidate."""
+
+    def __init__(self, core, analyzers, sample_fps=2.0, workers=4, max_pending_frames=16):
+        self.core = core
+        self.analyzers = list(analyzers)
+        self.sample_fps = sample_fps
+        self.workers = max(1, int(workers))
+        self.max_pending_frames = max(1, int(max_pending_frames))
+
+    def run(self, jobs):
+        """Analyze {userId: [video paths]} and return {userId: summary}."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='candidate') as executor:
+            futures = OrderedDict((user_id, executor.submit(self.analyze_candidate, user_id, paths))
+                                  for user_id, paths in jobs.items())
+            return OrderedDict((user_id, future.result()) for user_id, future in futures.items())
+
+    def analyze_candidate(self, user_id, paths):
+        summary = {'videos': [], 'report': None}
+        offset = 0.0
+        # The blink history runs on the videos' own timeline, apart from the live one in MongoDB
+        eye_session = EyeSession(**self.core.EYE_SESSION_SETTINGS)
+        try:
+            for path in paths:
+                video = self.analyze_video(path, user_id, offset, eye_session)
+                summary['videos'].append(video)
+                # Later videos continue the candidate's timeline, so the blink history stays in order
+                offset += video['duration_seconds'] + 60.0
+        finally:
+            self.release_sessions(user_id)
+
+        # Make the counters visible before reading the report
+        self.core.stats_buffer.flush()
+        if ObjectId.is_valid(user_id):
+            _, summary['report'] = self.core.report_store.get(user_id)
+        return summary
+
+    def analyze_video(self, path, user_id, offset=0.0, eye_session=None):
+        started = time.perf_counter()
+        if eye_session is None:
+            eye_session = EyeSession(**self.core.EYE_SESSION_SETTINGS)
+        reader = VideoFrameReader(path, self.sample_fps)
+        reader.start()
+
+        lanes = {name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'video-{name}')
+                 for name in self.analyzers}
+        results = {name: Counter() for name in self.analyzers}
+        errors = Counter()
+        pending = deque()
+        sampled = 0
+        failure = None
+        try:
+            for seconds, frame in reader.frames():
+                sampled += 1
+                # Shared by every analyzer of this frame
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                pending.append([(name, lanes[name].submit(self.analyze_frame, name, frame, user_id, gray,
+                                                          offset + seconds, eye_session))
+                                for name in self.analyzers])
+                while len(pending) > self.max_pending_frames:
+                    self._collect(pending.popleft(), results, errors)
+        except Exception as e:
+            failure = str(e)
+            print(f"Error decoding {path}: {e}")
+        finally:
+            while pending:
+                self._collect(pending.popleft(), results, errors)
+            for lane in lanes.values():
+                lane.shutdown()
+
+        elapsed = time.perf_counter() - started
+        video = {
+            'path': path,
+            'duration_seconds': round(reader.duration, 2),
+            'frames_sampled': sampled,
+            'elapsed_seconds': round(elapsed, 2),
+            'speed': round(reader.duration / elapsed, 1) if elapsed > 0 else None,
+            'results': {name: dict(counts) for name, counts in results.items()},
+            'errors': dict(errors)
+        }
+        if failure:
+            video['failure'] = failure
+        print(f"🎞️ {path}: {sampled} frames from {video['duration_seconds']}s of video in "
+              f"{video['elapsed_seconds']}s ({video['speed']}x real-time)")
+        return video
+
+    def analyze_frame(self, name, frame, user_id, gray, timestamp, eye_session):
+        """Run one analyzer on a frame and return the label counted in the summary.
+
+        `timestamp` is the frame's position in the candidate's videos; the frame-change cache and
+        the blink history age by it rather than by the wall clock, which runs many times slower.
+        """
+        core = self.core
+        if name == 'emotion':
+            return core.process_emotion_frame(frame, user_id, gray, timestamp=timestamp)['emotion']
+        if name == 'posture':
+            return core.process_posture_frame(frame, user_id, gray, timestamp=timestamp)['posture']
+        return core.process_eye_frame(frame, user_id, gray, timestamp=timestamp, session=eye_session)['status']
+
+    def release_sessions(self, user_id):
+        """Drop the candidate's trackers and cached results once their videos are done."""
+        core = self.core
+        core.pose_pool.discard(user_id)
+        for pipeline in ('emotion', 'eyes'):
+            core.face_trackers.discard((pipeline, user_id))
+        core.frame_cache.discard(user_id)
+
+    def _collect(self, frame_futures, results, errors):
+        for name, future in frame_futures:
+            try:
+                results[name][future.result()] += 1
+            except Exception as e:
+                errors[name] += 1
+                if errors[name] == 1:
+                    print(f"Error in {name} analysis: {e}")
+
+
+def group_videos(paths, user_id=None):
+    """{userId: [paths]}: every path for `user_id` if given, otherwise each file's name without extension."""
+    jobs = OrderedDict()
+    for path in paths:
+        key = user_id or os.path.splitext(os.path.basename(path))[0]
+        jobs.setdefault(key, []).append(path)
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='+', help='Recorded interview videos')
+    parser.add_argument('--user-id', help='Candidate every video belongs to (default: each file name)')
+    parser.add_argument('--fps', type=float, default=2.0, help='Frames analyzed per second of video (0: every frame)')
+    parser.add_argument('--analyzers', default='emotion,posture,eyes',
+                        help=f"Comma-separated subset of {', '.join(ANALYZER_MODELS)}")
+    parser.add_argument('--workers', type=int, default=4, help='Candidates analyzed concurrently')
+    parser.add_argument('--output', help='Directory to write one <userId>.json summary and report to')
+    args = parser.parse_args()
+
+    analyzers = [name for name in args.analyzers.split(',') if name]
+    unknown = [name for name in analyzers if name not in ANALYZER_MODELS]
+    if unknown or not analyzers:
+        parser.error(f"Unknown analyzers: {', '.join(unknown) or '(none)'}")
+
+    import app as core  # loads the models, stats buffer and report store like the server
+
+    models = [model for name in analyzers for model in ANALYZER_MODELS[name]]
+    core.model_registry.wait_ready()
+    if not core.model_registry.is_ready(*models):
+        parser.exit(1, f"Models not ready: {json.dumps(core.model_registry.status())}\n")
+
+    batch = VideoBatch(core, analyzers, sample_fps=args.fps, workers=args.workers)
+    summaries = batch.run(group_videos(args.videos, args.user_id))
+    core.stats_buffer.flush()
+
+    for user_id, summary in summaries.items():
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+            with open(os.path.join(args.output, f'{user_id}.json'), 'w', encoding='utf-8') as f:
+                json.dump({'userId': user_id, **summary}, f, indent=2)
+        if summary['report'] is None:
+            print(f"⚠️ No report for {user_id} (not a registered user); stats were still recorded")
+        elif not args.output:
+            print(json.dumps({'userId': user_id, 'report': summary['report']}, indent=2))
+
+
+if __name__ == '__main__':
+    main()